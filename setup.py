@@ -6,5 +6,6 @@ setup(name="stacknn",
       description="Differentiable stacks and queues in PyTorch",
       author="Will Merrill, Computational Linguistics at Yale",
       url="https://github.com/viking-sudo-rm/StackNN",
-      packages=["stacknn", "stacknn.structs", "stacknn.utils", "stacknn.superpos", "stacknn.superpos.functional"],
+      packages=["stacknn", "stacknn.structs", "stacknn.utils", "stacknn.superpos", "stacknn.superpos.functional",
+                "stacknn.benchmarks", "stacknn.examples"],
 )
@@ -1,2 +1,19 @@
-import stacknn.superpos as superpos
-import stacknn.structs as structs
+"""Differentiable stacks and queues in PyTorch.
+
+The subpackages are imported on first access, so that e.g. a script that only uses
+stacknn.superpos does not pay for importing stacknn.structs.
+"""
+
+import importlib
+
+__all__ = ["structs", "superpos"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module("stacknn." + name)
+    raise AttributeError("module 'stacknn' has no attribute {!r}".format(name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,4 @@
+"""Performance benchmarks for the weighted structs and the superposition stacks.
+
+Run them with python -m stacknn.benchmarks. See python -m stacknn.benchmarks --help.
+"""
@@ -0,0 +1,44 @@
+import argparse
+import json
+import sys
+
+from stacknn.benchmarks.microbench import FULL, QUICK, compare, run_suite
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(prog="python -m stacknn.benchmarks",
+                                     description="Microbenchmarks for stacknn.")
+    parser.add_argument("--full", action="store_true", help="Run the full sweep instead of the quick one.")
+    parser.add_argument("--filter", default=None, help="Only run cases whose key contains this string.")
+    parser.add_argument("--min-time", type=float, default=.2, help="Minimum seconds to time each case.")
+    parser.add_argument("--no-profile", action="store_true", help="Skip counting allocations.")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path.")
+    parser.add_argument("--baseline", default=None, help="Compare against results saved with --output.")
+    parser.add_argument("--threshold", type=float, default=.1,
+                        help="Fractional drop in steps/sec that counts as a regression.")
+    return parser.parse_args(args)
+
+
+def main(args=None) -> int:
+    args = parse_args(args)
+    results = run_suite(FULL if args.full else QUICK, args.filter, args.min_time, not args.no_profile)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.threshold)
+        for key in regressions:
+            print("Regression: {}".format(key), file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Import time of the stacknn modules on top of torch.
+
+Each import runs in a fresh interpreter, so that nothing is cached in sys.modules. torch is
+imported before the timer starts, so the times only count what stacknn adds. Run with
+python -m stacknn.benchmarks.import_time.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+STATEMENTS = [
+    "import stacknn",
+    "import stacknn.superpos",
+    "from stacknn.superpos import Stack",
+    "import stacknn.superpos.functional",
+    "from stacknn.structs import Stack",
+]
+
+# Prints the time spent in statement, after running setup.
+_TEMPLATE = "import time; {}; start = time.perf_counter(); {}; print(time.perf_counter() - start)"
+
+
+def time_import(statement: str, setup: str = "import torch", repeat: int = 5) -> float:
+    """Return the median time in seconds of running statement after setup in a fresh
+    interpreter."""
+    times = []
+    for _ in range(repeat):
+        code = _TEMPLATE.format(setup, statement)
+        output = subprocess.check_output([sys.executable, "-c", code])
+        times.append(float(output.decode().split()[-1]))
+    return statistics.median(times)
+
+
+def run(statements: List[str] = STATEMENTS, repeat: int = 5) -> Dict[str, float]:
+    """Time import torch on its own, and each statement on top of it."""
+    results = {"import torch": time_import("import torch", setup="pass", repeat=repeat)}
+    for statement in statements:
+        results[statement] = time_import(statement, repeat=repeat)
+    return results
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m stacknn.benchmarks.import_time",
+                                     description="Import time of stacknn relative to torch.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(args)
+    json.dump(run(repeat=args.repeat), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
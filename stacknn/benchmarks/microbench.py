@@ -0,0 +1,175 @@
+import itertools
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import torch
+from torch.profiler import ProfilerActivity, profile
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+from stacknn import structs, superpos
+from stacknn.structs.null import NullStruct
+
+
+SUPERPOS_TYPES = [
+    superpos.Stack,
+    superpos.NoOpStack,
+    superpos.MinimalistStack,
+    superpos.MultiPopStack,
+    superpos.MultiPushStack,
+    superpos.RewriteStack,
+    superpos.TransitionParserStack,
+    superpos.Queue,
+    superpos.Deque,
+]
+
+STRUCT_TYPES = [structs.Stack, structs.Queue, NullStruct]
+
+# Superposition stacks whose number of actions is a constructor argument.
+VARIABLE_ACTIONS = (superpos.MultiPopStack, superpos.MultiPushStack)
+
+
+class Sweep(NamedTuple):
+    batch_sizes: List[int]
+    stack_dims: List[int]
+    seq_lens: List[int]
+    max_depths: List[Optional[int]]
+    num_actions: List[int]
+
+
+QUICK = Sweep([1, 16], [8], [16], [None, 8], [4])
+FULL = Sweep([1, 16, 128], [8, 64], [16, 128], [None, 16], [3, 6])
+
+
+class Case(NamedTuple):
+    name: str
+    batch_size: int
+    stack_dim: int
+    seq_len: int
+    max_depth: Optional[int]
+    num_actions: Optional[int]
+    backward: bool
+
+    @property
+    def key(self) -> str:
+        """A string that identifies the case in the JSON output and in baselines."""
+        return "{}/b={}/d={}/t={}/depth={}/actions={}/{}".format(
+            self.name, self.batch_size, self.stack_dim, self.seq_len, self.max_depth,
+            self.num_actions, "backward" if self.backward else "forward")
+
+
+def get_cases(sweep: Sweep) -> Iterator[Case]:
+    """Enumerate the cases of a sweep. max_depth and num_actions only apply where the variant
+    supports them."""
+    shapes = list(itertools.product(sweep.batch_sizes, sweep.stack_dims, sweep.seq_lens))
+    for stack_type, (batch_size, stack_dim, seq_len), backward in itertools.product(
+            SUPERPOS_TYPES, shapes, [False, True]):
+        actions = sweep.num_actions if issubclass(stack_type, VARIABLE_ACTIONS) else [None]
+        for max_depth, num_actions in itertools.product(sweep.max_depths, actions):
+            yield Case(stack_type.__name__, batch_size, stack_dim, seq_len, max_depth, num_actions,
+                       backward)
+    for struct_type, (batch_size, stack_dim, seq_len), backward in itertools.product(
+            STRUCT_TYPES, shapes, [False, True]):
+        yield Case("structs." + struct_type.__name__, batch_size, stack_dim, seq_len, None, None,
+                   backward)
+
+
+def _make_run(case: Case) -> Callable[[], None]:
+    """Build a closure that runs one sequence of the case, including the backward pass if needed."""
+    torch.manual_seed(0)
+    if case.name.startswith("structs."):
+        struct_type = next(t for t in STRUCT_TYPES if "structs." + t.__name__ == case.name)
+        values = torch.randn(case.seq_len, case.batch_size, case.stack_dim,
+                             requires_grad=case.backward)
+        strengths = torch.rand(case.seq_len, 3, case.batch_size, 1, requires_grad=case.backward)
+
+        def run():
+            struct = struct_type(case.batch_size, case.stack_dim)
+            reads = [struct(values[t], strengths[t, 0], strengths[t, 1], strengths[t, 2])
+                     for t in range(case.seq_len)]
+            loss = torch.stack(reads).sum()
+            # NullStruct reads constant zeros, so it has nothing to backpropagate.
+            if case.backward and loss.requires_grad:
+                loss.backward()
+        return run
+
+    stack_type = next(t for t in SUPERPOS_TYPES if t.__name__ == case.name)
+    kwargs = {} if case.num_actions is None else {"num_actions": case.num_actions}
+    num_actions = case.num_actions or stack_type(case.stack_dim).get_num_actions()
+    logits = torch.randn(case.seq_len, case.batch_size, num_actions, requires_grad=case.backward)
+    new_vecs = torch.randn(case.seq_len, case.batch_size, case.stack_dim,
+                           requires_grad=case.backward)
+
+    def run():
+        stack = stack_type.empty(case.batch_size, case.stack_dim, case.max_depth, **kwargs)
+        policies = torch.softmax(logits, dim=-1)
+        for t in range(case.seq_len):
+            stack.update(policies[t], new_vecs[t])
+        if case.backward:
+            stack.tapes.sum().backward()
+    return run
+
+
+def _count_allocations(run: Callable[[], None]) -> Dict[str, int]:
+    """Count the CPU allocations made by one run, as seen by the profiler."""
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        run()
+    sizes = [event.self_cpu_memory_usage for event in prof.events()
+             if event.self_cpu_memory_usage > 0]
+    return {"allocations": len(sizes), "allocated_bytes": sum(sizes)}
+
+
+def peak_rss_kb() -> Optional[int]:
+    """The peak resident set size of this process so far, in kilobytes."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_case(case: Case, min_time: float = .2, profile_memory: bool = True) -> Dict:
+    """Time a case for at least min_time seconds and return its statistics."""
+    run = _make_run(case)
+    run()  # Warm up.
+
+    num_runs = 0
+    start = time.perf_counter()
+    elapsed = 0.
+    while elapsed < min_time or num_runs == 0:
+        run()
+        num_runs += 1
+        elapsed = time.perf_counter() - start
+
+    result = case._asdict()
+    result.update(steps_per_sec=num_runs * case.seq_len / elapsed, peak_rss_kb=peak_rss_kb())
+    if profile_memory:
+        result.update(_count_allocations(run))
+    return result
+
+
+def run_suite(sweep: Sweep = QUICK,
+              pattern: Optional[str] = None,
+              min_time: float = .2,
+              profile_memory: bool = True) -> Dict[str, Dict]:
+    """Run every case of a sweep whose key contains pattern, keyed by Case.key."""
+    results = {}
+    for case in get_cases(sweep):
+        if pattern is None or pattern in case.key:
+            results[case.key] = run_case(case, min_time, profile_memory)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float = .1) -> List[str]:
+    """Return the keys of cases whose steps/sec dropped by more than threshold relative to the
+    baseline. Cases missing from either side are ignored."""
+    regressions = []
+    for key, result in results.items():
+        if key in baseline:
+            floor = (1. - threshold) * baseline[key]["steps_per_sec"]
+            if result["steps_per_sec"] < floor:
+                regressions.append(key)
+    return regressions
@@ -0,0 +1,106 @@
+"""Scaling of the weighted structs with the number of batch shards run in parallel.
+
+Each run times the forward steps of a ShardedStruct over a fixed batch, for an increasing number of
+shards, and reports the speedup over a single shard. Run it with python -m stacknn.benchmarks.sharding.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import torch
+
+from stacknn import structs
+from stacknn.structs.sharded import ShardedStruct
+
+
+def default_shard_counts(max_shards: Optional[int] = None) -> List[int]:
+    """Powers of two up to the number of cores, and the number of cores itself."""
+    max_shards = max_shards or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= max_shards:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_shards:
+        counts.append(max_shards)
+    return counts
+
+
+def run_sharded(struct_name: str,
+                num_shards: int,
+                batch_size: int = 256,
+                embedding_size: int = 16,
+                length: int = 32,
+                repeats: int = 3,
+                seed: int = 0) -> float:
+    """Return the best time in seconds of length forward steps over repeats runs."""
+    torch.manual_seed(seed)
+    struct_type = getattr(structs, struct_name)
+    values = torch.randn(length, batch_size, embedding_size)
+    pop_strengths = torch.rand(length, batch_size, 1)
+    push_strengths = torch.rand(length, batch_size, 1)
+
+    best = float("inf")
+    for _ in range(repeats):
+        struct = ShardedStruct(struct_type, batch_size, embedding_size, num_shards=num_shards)
+        with torch.no_grad():
+            start = time.perf_counter()
+            for t in range(length):
+                struct(values[t], pop_strengths[t], push_strengths[t])
+            best = min(best, time.perf_counter() - start)
+        struct.close()
+    return best
+
+
+def run_scaling(struct_name: str = "Stack",
+                shard_counts: Optional[Sequence[int]] = None,
+                intra_op_threads: Optional[int] = 1,
+                **kwargs) -> List[Dict]:
+    """Time struct_name for each number of shards and report the speedup over one shard."""
+    shard_counts = shard_counts or default_shard_counts()
+    num_threads = torch.get_num_threads()
+    if intra_op_threads is not None:
+        torch.set_num_threads(intra_op_threads)
+    try:
+        times = [run_sharded(struct_name, num_shards, **kwargs) for num_shards in shard_counts]
+    finally:
+        torch.set_num_threads(num_threads)
+
+    return [{
+        "struct": struct_name,
+        "num_shards": num_shards,
+        "seconds": seconds,
+        "speedup": times[0] / seconds,
+    } for num_shards, seconds in zip(shard_counts, times)]
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m stacknn.benchmarks.sharding",
+                                     description="Speedup of ShardedStruct with the number of shards.")
+    parser.add_argument("--structs", nargs="+", default=["Stack", "Queue"])
+    parser.add_argument("--shards", nargs="+", type=int, default=None,
+                        help="Numbers of shards to time. Defaults to powers of two up to the number of cores.")
+    parser.add_argument("--intra-op-threads", type=int, default=1,
+                        help="Value for torch.set_num_threads while timing. 0 leaves it unchanged.")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--length", type=int, default=32)
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path.")
+    args = parser.parse_args(args)
+
+    results = []
+    for struct_name in args.structs:
+        results.extend(run_scaling(struct_name, args.shards, args.intra_op_threads or None,
+                                   batch_size=args.batch_size, length=args.length))
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
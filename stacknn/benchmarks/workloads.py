@@ -0,0 +1,238 @@
+"""End-to-end throughput of a small controller trained on synthetic stack tasks.
+
+Unlike the microbenchmarks, these time the interaction between a recurrent controller and its
+stack: the controller reads from the stack, decides on an action, and backpropagates through the
+whole sequence. Run them with python -m stacknn.benchmarks.workloads.
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from stacknn import structs
+from stacknn.benchmarks.microbench import SUPERPOS_TYPES, peak_rss_kb
+from stacknn.structs.base import Struct
+from stacknn.superpos.base import AbstractStack
+from stacknn.superpos.module import StackModule
+
+
+# Targets that do not contribute to the loss.
+IGNORE_INDEX = -100
+
+Batch = Tuple[torch.LongTensor, torch.LongTensor]
+
+
+def dyck_batches(batch_size: int,
+                 length: int,
+                 num_types: int = 2,
+                 generator: Optional[torch.Generator] = None) -> Iterator[Batch]:
+    """Yield batches of balanced strings over num_types kinds of brackets, forever.
+
+    Token 2k opens and token 2k + 1 closes a bracket of type k. At each position, the target is the
+    type of the innermost open bracket, or num_types if every bracket is closed, which requires a
+    stack to predict. length should be even.
+    """
+    while True:
+        depths = torch.zeros(batch_size, dtype=torch.long)
+        open_types = torch.zeros(batch_size, length + 1, dtype=torch.long)
+        rows = torch.arange(batch_size)
+        inputs, targets = [], []
+        for t in range(length):
+            remaining = length - t
+            coins = torch.rand(batch_size, generator=generator) < .5
+            opening = (depths == 0) | (coins & (depths < remaining - 1))
+            types = torch.randint(num_types, (batch_size,), generator=generator)
+            top = open_types[rows, (depths - 1).clamp(min=0)]
+            inputs.append(torch.where(opening, 2 * types, 2 * top + 1))
+
+            open_types[rows, depths] = torch.where(opening, types, open_types[rows, depths])
+            depths = depths + torch.where(opening, 1, -1)
+            top = open_types[rows, (depths - 1).clamp(min=0)]
+            targets.append(torch.where(depths > 0, top, num_types))
+        yield torch.stack(inputs, 1), torch.stack(targets, 1)
+
+
+def _sequence_batches(batch_size: int,
+                      length: int,
+                      num_symbols: int,
+                      reverse: bool,
+                      generator: Optional[torch.Generator] = None) -> Iterator[Batch]:
+    """Yield batches of [symbols, separator, blanks] whose targets after the separator are the
+    symbols, possibly reversed. Token 0 is the blank, 1 the separator, and symbols start at 2."""
+    blanks = torch.zeros(batch_size, length, dtype=torch.long)
+    separator = torch.ones(batch_size, 1, dtype=torch.long)
+    ignored = torch.full((batch_size, length + 1), IGNORE_INDEX, dtype=torch.long)
+    while True:
+        symbols = torch.randint(2, num_symbols + 2, (batch_size, length), generator=generator)
+        outputs = symbols.flip(1) if reverse else symbols
+        yield torch.cat([symbols, separator, blanks], 1), torch.cat([ignored, outputs], 1)
+
+
+def reversal_batches(batch_size: int, length: int, num_symbols: int = 4,
+                     generator: Optional[torch.Generator] = None) -> Iterator[Batch]:
+    """Yield string reversal batches, a stack task. See _sequence_batches."""
+    return _sequence_batches(batch_size, length, num_symbols, True, generator)
+
+
+def copy_batches(batch_size: int, length: int, num_symbols: int = 4,
+                 generator: Optional[torch.Generator] = None) -> Iterator[Batch]:
+    """Yield string copying batches, a queue task. See _sequence_batches."""
+    return _sequence_batches(batch_size, length, num_symbols, False, generator)
+
+
+class Task(NamedTuple):
+    batches: Callable[..., Iterator[Batch]]
+    vocab_size: int
+    num_classes: int
+
+
+TASKS = {
+    "dyck": Task(dyck_batches, 4, 3),
+    "reversal": Task(reversal_batches, 6, 6),
+    "copy": Task(copy_batches, 6, 6),
+}
+
+
+class Controller(nn.Module):
+
+    """An LSTM controller that reads from a stack at each step and then updates it.
+
+    With num_actions, the stack is an AbstractStack driven by a policy over num_actions actions,
+    and the controller reads the top row of its tapes. Otherwise it is a weighted Struct driven by
+    pop and push strengths.
+
+    The stack is either passed to forward, or owned by the controller as a persistent submodule,
+    i.e. a StackModule or a Struct, which is reset at the start of every batch.
+    """
+
+    def __init__(self,
+                 vocab_size: int,
+                 num_classes: int,
+                 hidden_size: int,
+                 stack_dim: int,
+                 num_actions: Optional[int] = None,
+                 stack: Optional[nn.Module] = None):
+        super().__init__()
+        self.stack_dim = stack_dim
+        self.embedding = nn.Embedding(vocab_size, hidden_size)
+        self.cell = nn.LSTMCell(hidden_size + stack_dim, hidden_size)
+        self.output = nn.Linear(hidden_size, num_classes)
+        self.new_vec = nn.Linear(hidden_size, stack_dim)
+        self.action = nn.Linear(hidden_size, num_actions or 2)
+        self.stack = stack
+
+    def forward(self,
+                inputs: torch.LongTensor,  # Tokens of shape [batch_size, length].
+                stack=None) -> torch.FloatTensor:
+        batch_size, length = inputs.size()
+        if stack is None:
+            stack = self.stack
+            stack.reset(batch_size)
+        if isinstance(stack, StackModule):
+            stack = stack.stack
+        embedded = self.embedding(inputs)
+        hidden = embedded.new_zeros(batch_size, self.cell.hidden_size)
+        state = hidden, hidden
+        read = embedded.new_zeros(batch_size, self.stack_dim)
+
+        logits = []
+        for t in range(length):
+            state = self.cell(torch.cat([embedded[:, t], read], -1), state)
+            hidden = state[0]
+            new_vec = torch.tanh(self.new_vec(hidden))
+            if isinstance(stack, AbstractStack):
+                read = stack.update(torch.softmax(self.action(hidden), -1), new_vec)[:, 0]
+            else:
+                pop, push = torch.sigmoid(self.action(hidden)).chunk(2, dim=-1)
+                read = stack(new_vec, pop, push)
+            logits.append(self.output(hidden))
+        return torch.stack(logits, 1)
+
+
+def get_stack_factory(name: str, stack_dim: int, max_depth: Optional[int] = None):
+    """Return a function from a batch size to an empty stack, and the stack's number of actions.
+
+    name is the name of a class in stacknn.superpos, or structs.Stack for the weighted stack.
+    """
+    if name == "structs.Stack":
+        return (lambda batch_size: structs.Stack(batch_size, stack_dim)), None
+    stack_type = next(t for t in SUPERPOS_TYPES if t.__name__ == name)
+    num_actions = stack_type(stack_dim).get_num_actions()
+    return (lambda batch_size: stack_type.empty(batch_size, stack_dim, max_depth)), num_actions
+
+
+def run_workload(task_name: str,
+                 stack_name: str,
+                 steps: int = 20,
+                 batch_size: int = 16,
+                 length: int = 16,
+                 hidden_size: int = 32,
+                 stack_dim: int = 8,
+                 max_depth: Optional[int] = None,
+                 seed: int = 0) -> Dict:
+    """Train a controller with a stack on a task for a fixed number of steps and report its
+    throughput. Generating the batches is not timed."""
+    torch.manual_seed(seed)
+    task = TASKS[task_name]
+    make_stack, num_actions = get_stack_factory(stack_name, stack_dim, max_depth)
+    controller = Controller(task.vocab_size, task.num_classes, hidden_size, stack_dim, num_actions)
+    optimizer = torch.optim.Adam(controller.parameters())
+    loss_fn = nn.CrossEntropyLoss(ignore_index=IGNORE_INDEX)
+    batches = task.batches(batch_size, length)
+
+    num_tokens = 0
+    elapsed = 0.
+    loss = None
+    for _ in range(steps):
+        inputs, targets = next(batches)
+        start = time.perf_counter()
+        optimizer.zero_grad()
+        logits = controller(inputs, make_stack(batch_size))
+        loss = loss_fn(logits.flatten(0, 1), targets.flatten())
+        loss.backward()
+        optimizer.step()
+        elapsed += time.perf_counter() - start
+        num_tokens += inputs.numel()
+
+    return {
+        "task": task_name,
+        "stack": stack_name,
+        "tokens_per_sec": num_tokens / elapsed,
+        "peak_rss_kb": peak_rss_kb(),
+        "final_loss": loss.item(),
+    }
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m stacknn.benchmarks.workloads",
+                                     description="End-to-end controller throughput on synthetic tasks.")
+    parser.add_argument("--tasks", nargs="+", default=sorted(TASKS), choices=sorted(TASKS))
+    parser.add_argument("--stacks", nargs="+", default=None,
+                        help="Names of stacknn.superpos classes, or structs.Stack. Defaults to all.")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--length", type=int, default=16)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this path.")
+    args = parser.parse_args(args)
+
+    stacks = args.stacks or [t.__name__ for t in SUPERPOS_TYPES] + ["structs.Stack"]
+    results = [run_workload(task, stack, args.steps, args.batch_size, args.length,
+                            max_depth=args.max_depth)
+               for task in args.tasks for stack in stacks]
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Runnable examples of training models augmented with stacks."""
@@ -0,0 +1,150 @@
+"""Data-parallel training of a stack-augmented LSTM across local CPU processes.
+
+Every process builds the same model, takes its share of each global batch of Dyck strings, and
+trains with DistributedDataParallel over the gloo backend, which averages the gradients between
+processes after every backward pass. The stack is a submodule of the model: its contents are
+per-process state that is emptied at the start of every batch, not a parameter or a buffer, so DDP
+neither broadcasts nor synchronizes it.
+
+Run it with python -m stacknn.examples.ddp --world-size 4. To train across nodes, start one copy per
+node with torch.distributed.run instead and pass its rendezvous as --init-method.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Dict, Optional
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+
+from stacknn import structs, superpos
+from stacknn.benchmarks.workloads import IGNORE_INDEX, TASKS, Controller
+
+
+def make_model(task_name: str = "dyck",
+               stack_name: str = "Stack",
+               hidden_size: int = 32,
+               stack_dim: int = 8) -> Controller:
+    """Build a Controller that owns its stack as a persistent submodule.
+
+    stack_name is the name of a class in stacknn.superpos, wrapped in a StackModule, or
+    structs.Stack for the weighted stack.
+    """
+    task = TASKS[task_name]
+    if stack_name == "structs.Stack":
+        stack, num_actions = structs.Stack(1, stack_dim), None
+    else:
+        stack = superpos.StackModule(getattr(superpos, stack_name)(stack_dim))
+        num_actions = stack.get_num_actions()
+    return Controller(task.vocab_size, task.num_classes, hidden_size, stack_dim, num_actions,
+                      stack=stack)
+
+
+def local_loss(logits: torch.FloatTensor,
+               targets: torch.LongTensor,
+               num_targets: int,
+               world_size: int) -> torch.FloatTensor:
+    """The loss of one process's share of a global batch with num_targets targets in total.
+
+    DDP averages the gradients of the processes, so each process sums the loss over its own targets
+    and scales it by world_size / num_targets. The averaged gradient is then the gradient of the
+    mean loss over the global batch, even if the processes got different numbers of targets.
+    """
+    loss = nn.functional.cross_entropy(logits.flatten(0, 1), targets.flatten(),
+                                       ignore_index=IGNORE_INDEX, reduction="sum")
+    return loss * world_size / max(num_targets, 1)
+
+
+def train(rank: int,
+          world_size: int,
+          init_method: str,
+          task_name: str = "dyck",
+          stack_name: str = "Stack",
+          steps: int = 20,
+          batch_size: int = 16,
+          length: int = 16,
+          num_threads: Optional[int] = None,
+          output_dir: Optional[str] = None,
+          seed: int = 0) -> Dict:
+    """Train on one process of a gloo process group and return the final loss of the global batch.
+
+    Every process draws the same global batches and trains on its contiguous share of them. Batches
+    that do not split evenly give the processes different batch sizes, which the stack handles by
+    being reset for each batch, while local_loss weights each process by its number of targets.
+    If output_dir is set, the process saves its final parameters there as rank<rank>.pt.
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    dist.init_process_group("gloo", init_method=init_method, rank=rank, world_size=world_size)
+    try:
+        torch.manual_seed(seed)
+        task = TASKS[task_name]
+        model = DistributedDataParallel(make_model(task_name, stack_name))
+        optimizer = torch.optim.Adam(model.parameters())
+        generator = torch.Generator().manual_seed(seed)
+        batches = task.batches(batch_size, length, generator=generator)
+
+        for _ in range(steps):
+            inputs, targets = next(batches)
+            num_targets = int((targets != IGNORE_INDEX).sum())
+            inputs, targets = (tensor.tensor_split(world_size)[rank] for tensor in (inputs, targets))
+            optimizer.zero_grad()
+            loss = local_loss(model(inputs), targets, num_targets, world_size)
+            loss.backward()
+            optimizer.step()
+
+        if output_dir is not None:
+            torch.save(model.module.state_dict(), os.path.join(output_dir, "rank{}.pt".format(rank)))
+        # The scaled losses of the processes average to the mean loss of the global batch.
+        final_loss = loss.detach() / world_size
+        dist.all_reduce(final_loss)
+        return {"rank": rank, "final_loss": final_loss.item()}
+    finally:
+        dist.destroy_process_group()
+
+
+def _spawned(rank: int, world_size: int, init_method: str, kwargs: Dict) -> None:
+    result = train(rank, world_size, init_method, **kwargs)
+    print("rank {rank}: final loss {final_loss:.4f}".format(**result))
+
+
+def launch(world_size: int, **kwargs) -> None:
+    """Run train on world_size local processes, which rendezvous through a temporary file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        init_method = "file://" + os.path.join(tmp, "rendezvous")
+        mp.spawn(_spawned, args=(world_size, init_method, kwargs), nprocs=world_size)
+
+
+def main(args=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m stacknn.examples.ddp",
+                                     description="Train a stack-augmented LSTM with DDP on CPU processes.")
+    parser.add_argument("--world-size", type=int, default=2)
+    parser.add_argument("--init-method", default=None,
+                        help="Rendezvous of an existing group, e.g. env:// under torch.distributed.run.")
+    parser.add_argument("--task", default="dyck", choices=sorted(TASKS))
+    parser.add_argument("--stack", default="Stack",
+                        help="Name of a stacknn.superpos class, or structs.Stack.")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=16, help="The global batch size.")
+    parser.add_argument("--length", type=int, default=16)
+    parser.add_argument("--threads-per-process", type=int, default=None)
+    args = parser.parse_args(args)
+
+    kwargs = dict(task_name=args.task, stack_name=args.stack, steps=args.steps,
+                  batch_size=args.batch_size, length=args.length,
+                  num_threads=args.threads_per_process)
+    if args.init_method is None:
+        launch(args.world_size, **kwargs)
+    else:
+        rank, world_size = int(os.environ["RANK"]), int(os.environ["WORLD_SIZE"])
+        _spawned(rank, world_size, args.init_method, kwargs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
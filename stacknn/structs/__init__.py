@@ -1,3 +1,36 @@
+"""Weighted differentiable stacks and queues.
+
+Each class is imported from its module on first access. See stacknn.superpos.
+"""
+
 from __future__ import absolute_import
 
-from stacknn.structs.simple import Stack, Queue
+import importlib
+
+# The module defining each public name.
+_EXPORTS = {
+    "Stack": "simple",
+    "Queue": "simple",
+    "SharedStructState": "shared",
+    "VectorizedStack": "vectorized",
+    "VectorizedQueue": "vectorized",
+    "InputBuffer": "buffers",
+    "OutputBuffer": "buffers",
+    "PointerInputBuffer": "buffers",
+    "SpillingStack": "spill",
+    "ShardedStruct": "sharded",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
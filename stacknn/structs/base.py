@@ -3,6 +3,8 @@ from abc import ABCMeta, abstractmethod
 import torch
 import torch.nn as nn
 
+from stacknn.utils import state
+
 
 class Struct(nn.Module):
     """
@@ -19,7 +21,7 @@ class Struct(nn.Module):
     """
     __metaclass__ = ABCMeta
 
-    def __init__(self, batch_size, embedding_size):
+    def __init__(self, batch_size, embedding_size, dtype=None):
         """
         Constructor for the Struct object. The data of the Struct are
         stored in two parts. self.contents is a matrix containing a list
@@ -37,10 +39,17 @@ class Struct(nn.Module):
         :type embedding_size: int
         :param embedding_size: The size of the vectors stored in this
             Struct
+
+        :type dtype: torch.dtype
+        :param dtype: The dtype of the vectors stored in this Struct,
+            e.g. torch.bfloat16. Strengths are always stored in at least
+            single precision. If None, vectors keep the dtype they are
+            pushed with
         """
         super(Struct, self).__init__()
         self.batch_size = batch_size
         self.embedding_size = embedding_size
+        self.dtype = dtype
 
     def forward(self,
                 values: torch.FloatTensor,
@@ -61,6 +70,79 @@ class Struct(nn.Module):
 
         return self.read(read_strengths)
 
+    def reset(self, batch_size=None):
+        """
+        Empties the data structure, e.g. to reuse it as a submodule of
+        a model for the next mini-batch. Structures without any state
+        only need to update their batch size.
+
+        :type batch_size: int
+        :param batch_size: The number of trials in the next mini-batch.
+            If None, the batch size is unchanged
+
+        :return: None
+        """
+        if batch_size is not None:
+            self.batch_size = batch_size
+
+    def detach(self):
+        """
+        Cuts the autograd history of the contents of the data structure,
+        e.g. for truncated backpropagation through time. Structures
+        without any state do not need to override this.
+
+        :return: None
+        """
+        pass
+
+    def save_state(self, path):
+        """
+        Saves the contents of the data structure as contiguous tensors,
+        e.g. to suspend a streaming session.
+
+        :type path: str
+        :param path: The file to write to
+
+        :return: None
+        """
+        values, strengths = self._get_state()
+        state.save_state(path, self._state_header(),
+                         {"values": values, "strengths": strengths})
+
+    def load_state(self, path, mmap=True):
+        """
+        Restores contents saved by self.save_state into a data
+        structure of the same type and size.
+
+        :type path: str
+        :param path: The file to read from
+
+        :type mmap: bool
+        :param mmap: If True, the contents are mapped from the file
+            rather than read up front, and stay on the CPU
+
+        :return: None
+        """
+        tensors = state.load_state(path, self._state_header(), mmap)
+        self._set_state(tensors["values"], tensors["strengths"])
+
+    def _state_header(self):
+        return {"type": type(self).__name__, "batch_size": self.batch_size,
+                "embedding_size": self.embedding_size}
+
+    def _get_state(self):
+        """
+        Returns the contents of the data structure as a [batch_size x
+        length x embedding_size] tensor of values and a [batch_size x
+        length] tensor of strengths.
+        """
+        raise NotImplementedError("{} does not support saving state".format(
+            type(self).__name__))
+
+    def _set_state(self, values, strengths):
+        raise NotImplementedError("{} does not support loading state".format(
+            type(self).__name__))
+
     @abstractmethod
     def pop(self, strength):
         """
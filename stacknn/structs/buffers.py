@@ -1,4 +1,8 @@
-from stacknn.structs.simple import Queue
+import torch
+
+from stacknn.structs.base import Struct
+import stacknn.structs.functional as F
+from stacknn.structs.simple import Queue, to_strength
 
 
 class InputBuffer(Queue):
@@ -24,8 +28,61 @@ class InputBuffer(Queue):
 class OutputBuffer(Queue):
     """
     A write-only neural queue.
+
+    If max_length is set, the pushed values and strengths are written
+    into preallocated [batch_size x max_length x embedding_size] and
+    [batch_size x max_length] tensors instead of Python lists, so the
+    output sequence can be used without stacking it. Read self.outputs
+    after the last write, since writing modifies it in place. In this
+    mode the buffer can still be read, but not popped.
     """
 
+    def __init__(self, batch_size, embedding_size, max_length=None,
+                 device=None, **kwargs):
+        """
+        Constructor for the OutputBuffer object.
+
+        :type max_length: int
+        :param max_length: If set, the number of time steps to
+            preallocate. See the class introduction
+
+        :type device: torch.device
+        :param device: The device of the preallocated tensors
+
+        See SimpleStruct for the other arguments.
+        """
+        super(OutputBuffer, self).__init__(batch_size, embedding_size,
+                                           **kwargs)
+        self.max_length = max_length
+        self.device = device
+        self.num_outputs = 0
+        self._allocate()
+
+    def _allocate(self):
+        if self.max_length is not None:
+            self._outputs = torch.zeros(self.batch_size, self.max_length,
+                                        self.embedding_size,
+                                        device=self.device, dtype=self.dtype)
+            self._output_strengths = torch.zeros(self.batch_size,
+                                                 self.max_length,
+                                                 device=self.device)
+
+    def reset(self, batch_size=None):
+        """
+        Empties the buffer. The outputs are written to new tensors, so
+        that views of the previous outputs stay valid.
+
+        :return: None
+        """
+        super(OutputBuffer, self).reset(batch_size)
+        self.num_outputs = 0
+        self._allocate()
+
+    def __len__(self):
+        if self.max_length is None:
+            return super(OutputBuffer, self).__len__()
+        return self.num_outputs
+
     def forward(self, v, d):
         """
         Only perform the push step.
@@ -40,3 +97,171 @@ class OutputBuffer(Queue):
         :return: None
         """
         self.push(v, d)
+
+    def push(self, value, strength):
+        if self.max_length is None:
+            super(OutputBuffer, self).push(value, strength)
+            return
+
+        if self.num_outputs == self.max_length:
+            raise ValueError("OutputBuffer is full after {} steps.".format(
+                self.max_length))
+        self._outputs[:, self.num_outputs] = value
+        self._output_strengths[:, self.num_outputs] = self._to_strength(strength)
+        self.num_outputs += 1
+
+    def pop(self, strength):
+        if self.max_length is not None:
+            raise NotImplementedError(
+                "OutputBuffer cannot pop when max_length is set")
+        super(OutputBuffer, self).pop(strength)
+
+    def read(self, strength):
+        if self.max_length is None:
+            return super(OutputBuffer, self).read(strength)
+        return F.read_queue(self.outputs, self.output_strengths,
+                            self._to_strength(strength))
+
+    def read_heads(self, strengths):
+        if self.max_length is None:
+            return super(OutputBuffer, self).read_heads(strengths)
+        return F.read_queue_heads(self.outputs, self.output_strengths,
+                                  to_strength(strengths))
+
+    def _to_strength(self, strength):
+        """
+        Converts a float or a [batch_size] or [batch_size x 1] tensor to
+        a [batch_size] tensor of strengths.
+        """
+        if not torch.is_tensor(strength):
+            return torch.full((self.batch_size,), strength,
+                              device=self._output_strengths.device)
+        return to_strength(strength).reshape(self.batch_size)
+
+    def _get_state(self):
+        if self.max_length is None:
+            return super(OutputBuffer, self)._get_state()
+        return self.outputs, self.output_strengths
+
+    def _set_state(self, values, strengths):
+        if self.max_length is None:
+            super(OutputBuffer, self)._set_state(values, strengths)
+            return
+
+        if values.size(1) > self.max_length:
+            raise ValueError("{} outputs do not fit in max_length {}.".format(
+                values.size(1), self.max_length))
+        self._allocate()
+        self.num_outputs = values.size(1)
+        self._outputs[:, :self.num_outputs] = values
+        self._output_strengths[:, :self.num_outputs] = strengths
+
+    def detach(self):
+        """
+        Detaches the contents from the autograd graph, including the
+        preallocated outputs if max_length is set.
+
+        :return: None
+        """
+        super(OutputBuffer, self).detach()
+        if self.max_length is not None:
+            self._outputs = self._outputs.detach()
+            self._output_strengths = self._output_strengths.detach()
+
+    @property
+    def outputs(self):
+        """
+        A zero-copy view of the values written so far. It is contiguous
+        once all max_length steps have been written.
+
+        :rtype: torch.FloatTensor
+        :return: [batch_size x num_outputs x embedding_size] tensor
+        """
+        return self._outputs[:, :self.num_outputs]
+
+    @property
+    def output_strengths(self):
+        """
+        :rtype: torch.FloatTensor
+        :return: [batch_size x num_outputs] tensor of the strengths
+            written so far
+        """
+        return self._output_strengths[:, :self.num_outputs]
+
+    def collapse(self):
+        """
+        Weights each output by the strength with which it was written.
+
+        :rtype: torch.FloatTensor
+        :return: [batch_size x num_outputs x embedding_size] tensor
+        """
+        strengths = self.output_strengths.to(self._outputs.dtype)
+        return self.outputs * strengths.unsqueeze(-1)
+
+
+class PointerInputBuffer(Struct):
+    """
+    A read-only neural queue over an input sequence that is given in
+    full up front.
+
+    Instead of pushing every input item and cascading over a list, the
+    buffer keeps the original strengths of the items and a soft pointer
+    per trial: the total strength popped so far. Since popping from a
+    queue always consumes the items at the front, popping u and then u'
+    is the same as popping u + u' from the untouched strengths, so each
+    pop and read is a fixed number of vectorized operations.
+    """
+
+    def __init__(self, inputs, strengths=None):
+        """
+        Constructor for the PointerInputBuffer object.
+
+        :type inputs: torch.FloatTensor
+        :param inputs: [batch_size x length x embedding_size] input
+            sequence, whose first item is at the front of the queue
+
+        :type strengths: torch.FloatTensor
+        :param strengths: [batch_size x length] strengths of the input
+            items. Defaults to 1 for every item
+        """
+        batch_size, length, embedding_size = inputs.size()
+        super(PointerInputBuffer, self).__init__(batch_size, embedding_size,
+                                                 inputs.dtype)
+        if strengths is None:
+            strengths = torch.ones(batch_size, length, device=inputs.device)
+        self.inputs = inputs
+        self.strengths = to_strength(strengths)
+        self.pointer = torch.zeros(batch_size, device=inputs.device,
+                                   dtype=self.strengths.dtype)
+
+    def __len__(self):
+        return self.inputs.size(1)
+
+    def forward(self, u):
+        """
+        Skip the push step. See InputBuffer.forward.
+        """
+        self.pop(u)
+        return self.read(1.)
+
+    def _to_strength(self, strength):
+        """
+        Converts a float or a [batch_size] or [batch_size x 1] tensor to
+        a [batch_size] tensor of strengths.
+        """
+        if not torch.is_tensor(strength):
+            return torch.full_like(self.pointer, strength)
+        return to_strength(strength).reshape(self.batch_size)
+
+    def pop(self, strength):
+        self.pointer = self.pointer + self._to_strength(strength)
+
+    def push(self, value, strength):
+        raise NotImplementedError("PointerInputBuffer is read-only")
+
+    def read(self, strength):
+        strengths = F.pop_queue(self.strengths, self.pointer)
+        return F.read_queue(self.inputs, strengths, self._to_strength(strength))
+
+    def detach(self):
+        self.pointer = self.pointer.detach()
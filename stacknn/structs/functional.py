@@ -0,0 +1,227 @@
+"""
+Tensor-only operations for the weighted stack and queue.
+
+The contents of a structure are represented by a [batch_size x length x
+embedding_size] tensor of values and a [batch_size x length] tensor of
+strengths, where index 0 is the oldest item. Strengths are
+[batch_size] tensors. Instead of looping over the items in a cascade,
+these functions compute the cascade in closed form from cumulative sums
+of the strengths, so they contain no Python control flow and can be
+compiled with torch.jit.script or torch.compile.
+"""
+
+from typing import Optional, Tuple
+
+import torch
+from torch.nn.functional import relu
+
+
+# The values and strengths of a structure.
+StructState = Tuple[torch.Tensor, torch.Tensor]
+
+
+def empty_state(batch_size: int,
+                embedding_size: int,
+                device: Optional[torch.device] = None,
+                dtype: Optional[torch.dtype] = None,
+                num_heads: Optional[int] = None) -> StructState:
+    """
+    Creates the state of a structure containing no items. If num_heads
+    is set, the state holds num_heads independent structures per
+    example, and all strengths and vectors passed to the other
+    functions get an extra [num_heads] dimension after the batch
+    dimension.
+    """
+    batch_shape = [batch_size] if num_heads is None else [batch_size, num_heads]
+    values = torch.zeros(batch_shape + [0, embedding_size], device=device, dtype=dtype)
+    strengths = torch.zeros(batch_shape + [0], device=device)
+    return values, strengths
+
+
+def strength_above(strengths: torch.Tensor) -> torch.Tensor:
+    """
+    Computes the total strength of the items pushed after each item,
+    i.e. the items above it on a stack.
+    """
+    return strengths.flip(-1).cumsum(-1).flip(-1) - strengths
+
+
+def strength_below(strengths: torch.Tensor) -> torch.Tensor:
+    """
+    Computes the total strength of the items pushed before each item,
+    i.e. the items in front of it in a queue.
+    """
+    return strengths.cumsum(-1) - strengths
+
+
+def push(values: torch.Tensor,
+         strengths: torch.Tensor,
+         value: torch.Tensor,
+         strength: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Appends an item with the given strength to the structure. Stacks
+    and queues both push new items after the existing ones.
+    """
+    values = torch.cat([values, value.to(values.dtype).unsqueeze(-2)], dim=-2)
+    strengths = torch.cat([strengths, strength.to(strengths.dtype).unsqueeze(-1)], dim=-1)
+    return values, strengths
+
+
+def pop(strengths: torch.Tensor,
+        strength: torch.Tensor,
+        preceding: torch.Tensor) -> torch.Tensor:
+    """
+    Removes a total amount of strength from the structure, where
+    preceding gives the strength that the popping cascade consumes
+    before reaching each item. An item keeps whatever strength remains
+    after the cascade reaches it.
+    """
+    return relu(strengths - relu(strength.unsqueeze(-1) - preceding))
+
+
+def read_weights(strengths: torch.Tensor,
+                 strength: torch.Tensor,
+                 preceding: torch.Tensor) -> torch.Tensor:
+    """
+    Computes the strength read from each item by a reading cascade,
+    where preceding gives the strength that the cascade consumes before
+    reaching each item.
+    """
+    return torch.min(strengths, relu(strength.unsqueeze(-1) - preceding))
+
+
+def read_heads(values: torch.Tensor,
+               strengths: torch.Tensor,
+               strength: torch.Tensor,
+               preceding: torch.Tensor) -> torch.Tensor:
+    """
+    Performs K reads at once, where strength has shape [batch_size x
+    K]. The reads share the cumulative strengths and are computed by
+    one batched matmul, giving a [batch_size x K x embedding_size]
+    output.
+    """
+    weights = read_weights(strengths.unsqueeze(-2), strength, preceding.unsqueeze(-2))
+    return torch.matmul(weights.to(values.dtype), values)
+
+
+def read(values: torch.Tensor,
+         strengths: torch.Tensor,
+         strength: torch.Tensor,
+         preceding: torch.Tensor) -> torch.Tensor:
+    """
+    Reads a total amount of strength from the structure, where
+    preceding gives the strength that the reading cascade consumes
+    before reaching each item. The output is the sum of the values
+    weighted by the strength read from each of them.
+    """
+    return read_heads(values, strengths, strength.unsqueeze(-1), preceding).squeeze(-2)
+
+
+def pop_stack(strengths: torch.Tensor, strength: torch.Tensor) -> torch.Tensor:
+    return pop(strengths, strength, strength_above(strengths))
+
+
+def read_stack(values: torch.Tensor,
+               strengths: torch.Tensor,
+               strength: torch.Tensor) -> torch.Tensor:
+    return read(values, strengths, strength, strength_above(strengths))
+
+
+def read_stack_heads(values: torch.Tensor,
+                     strengths: torch.Tensor,
+                     strength: torch.Tensor) -> torch.Tensor:
+    return read_heads(values, strengths, strength, strength_above(strengths))
+
+
+def pop_queue(strengths: torch.Tensor, strength: torch.Tensor) -> torch.Tensor:
+    return pop(strengths, strength, strength_below(strengths))
+
+
+def read_queue(values: torch.Tensor,
+               strengths: torch.Tensor,
+               strength: torch.Tensor) -> torch.Tensor:
+    return read(values, strengths, strength, strength_below(strengths))
+
+
+def read_queue_heads(values: torch.Tensor,
+                     strengths: torch.Tensor,
+                     strength: torch.Tensor) -> torch.Tensor:
+    return read_heads(values, strengths, strength, strength_below(strengths))
+
+
+def _to_strengths(strengths: torch.Tensor, values: torch.Tensor) -> torch.Tensor:
+    """
+    Reshapes [batch_size] or [batch_size x 1] strengths to [batch_size].
+    """
+    strengths = strengths.to(torch.promote_types(strengths.dtype, torch.float32))
+    return strengths.reshape(values.shape[:-1])
+
+
+def stack_step(state: StructState,
+               values: torch.Tensor,
+               pop_strengths: torch.Tensor,
+               push_strengths: torch.Tensor,
+               read_strengths: Optional[torch.Tensor] = None,
+              ) -> Tuple[StructState, torch.Tensor]:
+    """
+    Pops, pushes and reads from a stack, like Struct.forward, sharing
+    one cumulative sum of the strengths between the pop and the read.
+
+    :param state: The values and strengths of the stack
+    :param values: [batch_size x embedding_size] vectors to push
+    :param pop_strengths: [batch_size] strengths to pop
+    :param push_strengths: [batch_size] strengths to push with
+    :param read_strengths: [batch_size] strengths to read. Defaults to 1
+
+    :return: The new state and the [batch_size x embedding_size] read
+    """
+    stack_values, strengths = state
+    pop_strengths = _to_strengths(pop_strengths, values)
+    push_strengths = _to_strengths(push_strengths, values)
+    if read_strengths is None:
+        read_strengths = torch.ones_like(pop_strengths)
+    read_strengths = _to_strengths(read_strengths, values)
+
+    # One cumulative sum serves the pop and the read: the pop consumes
+    # pop_strengths from the top, so the strength left above an item
+    # afterwards is relu(above - pop_strengths), and the read reaches it
+    # after that and the pushed item.
+    above = strength_above(strengths)
+    pop_strengths = pop_strengths.unsqueeze(-1)
+    strengths = relu(strengths - relu(pop_strengths - above))
+    preceding = torch.cat([push_strengths.unsqueeze(-1) + relu(above - pop_strengths),
+                           torch.zeros_like(pop_strengths)], dim=-1)
+
+    stack_values, strengths = push(stack_values, strengths, values, push_strengths)
+    read_vectors = read(stack_values, strengths, read_strengths, preceding)
+    return (stack_values, strengths), read_vectors
+
+
+def queue_step(state: StructState,
+               values: torch.Tensor,
+               pop_strengths: torch.Tensor,
+               push_strengths: torch.Tensor,
+               read_strengths: Optional[torch.Tensor] = None,
+              ) -> Tuple[StructState, torch.Tensor]:
+    """
+    Pops, pushes and reads from a queue. See stack_step.
+    """
+    queue_values, strengths = state
+    pop_strengths = _to_strengths(pop_strengths, values)
+    push_strengths = _to_strengths(push_strengths, values)
+    if read_strengths is None:
+        read_strengths = torch.ones_like(pop_strengths)
+    read_strengths = _to_strengths(read_strengths, values)
+
+    # As in stack_step, but the pop and the read start at the front, and
+    # the pushed item is read after everything left behind by the pop.
+    below = strength_below(strengths)
+    pop_strengths = pop_strengths.unsqueeze(-1)
+    total = strengths.sum(dim=-1, keepdim=True)
+    strengths = relu(strengths - relu(pop_strengths - below))
+    preceding = torch.cat([relu(below - pop_strengths),
+                           relu(total - pop_strengths)], dim=-1)
+
+    queue_values, strengths = push(queue_values, strengths, values, push_strengths)
+    read_vectors = read(queue_values, strengths, read_strengths, preceding)
+    return (queue_values, strengths), read_vectors
@@ -1,7 +1,6 @@
 from __future__ import absolute_import
 
 import torch
-from torch.autograd import Variable
 
 from stacknn.structs.base import Struct
 
@@ -21,5 +20,5 @@ class NullStruct(Struct):
         pass
 
     def read(self, strength):
-        return Variable(torch.zeros([self.batch_size, self.embedding_size],
-                        device=strength.device))
+        return torch.zeros([self.batch_size, self.embedding_size],
+                           device=strength.device, dtype=self.dtype)
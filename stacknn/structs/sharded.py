@@ -0,0 +1,192 @@
+from __future__ import absolute_import
+
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from stacknn.structs.base import Struct
+
+
+def _call(method, grad_enabled, inference_mode, *args):
+    with torch.inference_mode(inference_mode), torch.set_grad_enabled(grad_enabled):
+        return method(*args)
+
+
+class ShardedStruct(Struct):
+    """
+    Runs a weighted structure on shards of the batch in parallel.
+
+    The batch is split into contiguous shards, each held by its own
+    structure, and every operation is applied to all shards at once on a
+    thread pool. Since torch releases the GIL inside its operators, the
+    many small tensor operations of the popping and reading cascades of
+    the shards can run on different cores. The reads of the shards are
+    concatenated back into one [batch_size x embedding_size] tensor, so
+    a ShardedStruct can be used wherever the structure it wraps is.
+
+    Each shard still uses torch's intra-op thread pool, so it usually
+    pays to call torch.set_num_threads with a small value, and to use
+    one shard per remaining core. Only the forward computation is
+    parallel: autograd runs the backward pass of a CPU graph on a single
+    thread.
+    """
+
+    def __init__(self, struct_type, batch_size, embedding_size,
+                 num_shards=None, executor=None, **kwargs):
+        """
+        Constructor for the ShardedStruct object.
+
+        :type struct_type: type
+        :param struct_type: The Struct class of the shards, e.g.
+            stacknn.structs.Stack
+
+        :type batch_size: int
+        :param batch_size: The number of trials in each mini-batch
+
+        :type embedding_size: int
+        :param embedding_size: The size of the vectors stored in this
+            ShardedStruct
+
+        :type num_shards: int
+        :param num_shards: The number of shards. Defaults to
+            torch.get_num_threads(), and is capped at batch_size
+
+        :type executor: concurrent.futures.Executor
+        :param executor: The pool running the shards, which may be
+            shared with other ShardedStructs. If None, a thread pool
+            with one thread per shard is created, and shut down by
+            self.close
+
+        :param kwargs: Further arguments to the constructor of
+            struct_type, e.g. dtype
+        """
+        super(ShardedStruct, self).__init__(batch_size, embedding_size,
+                                            kwargs.get("dtype"))
+        if num_shards is None:
+            num_shards = torch.get_num_threads()
+        num_shards = max(1, min(num_shards, batch_size))
+
+        self.shard_sizes = [len(shard) for shard in
+                            torch.arange(batch_size).tensor_split(num_shards)]
+        self.shards = nn.ModuleList([
+            struct_type(size, embedding_size, **kwargs)
+            for size in self.shard_sizes])
+
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(num_shards,
+                                          thread_name_prefix="ShardedStruct")
+        self.executor = executor
+
+    @property
+    def num_shards(self):
+        return len(self.shards)
+
+    def __len__(self):
+        return max(len(shard) for shard in self.shards)
+
+    def _split(self, arg):
+        """
+        Splits a tensor along the batch dimension, following
+        self.shard_sizes. Floats, Nones and tensors without a batch
+        dimension are passed to every shard.
+        """
+        if not torch.is_tensor(arg) or arg.dim() == 0:
+            return [arg] * self.num_shards
+        return arg.split(self.shard_sizes)
+
+    def _map(self, method, *args):
+        """
+        Calls a method of every shard on its shard of args, and returns
+        the results in order. Since grad mode is thread-local, the
+        shards run in the grad mode of the caller, e.g. under
+        torch.no_grad() or torch.inference_mode().
+        """
+        shard_args = zip(self.shards, *[self._split(arg) for arg in args])
+        if self.num_shards == 1:
+            return [getattr(shard, method)(*rest) for shard, *rest in shard_args]
+        futures = [self.executor.submit(_call, getattr(shard, method),
+                                        torch.is_grad_enabled(),
+                                        torch.is_inference_mode_enabled(),
+                                        *rest)
+                   for shard, *rest in shard_args]
+        return [future.result() for future in futures]
+
+    def forward(self, values, pop_strengths, push_strengths,
+                read_strengths=None):
+        """
+        Performs a pop, a push and a read on every shard. See
+        Struct.forward.
+        """
+        return torch.cat(self._map("forward", values, pop_strengths,
+                                   push_strengths, read_strengths))
+
+    def pop(self, strength):
+        self._map("pop", strength)
+
+    def push(self, value, strength):
+        self._map("push", value, strength)
+
+    def read(self, strength):
+        return torch.cat(self._map("read", strength))
+
+    def read_heads(self, strengths):
+        """
+        Performs several reads at once. See SimpleStruct.read_heads.
+        """
+        return torch.cat(self._map("read_heads", strengths))
+
+    def reset(self, batch_size=None):
+        """
+        Empties every shard. If the batch size changes, it is split
+        again among the same number of shards.
+
+        :return: None
+        """
+        super(ShardedStruct, self).reset(batch_size)
+        if batch_size is not None:
+            if batch_size < self.num_shards:
+                raise ValueError("Cannot split a batch of {} into {} shards.".format(
+                    batch_size, self.num_shards))
+            self.shard_sizes = [len(shard) for shard in
+                                torch.arange(batch_size).tensor_split(self.num_shards)]
+        for shard, size in zip(self.shards, self.shard_sizes):
+            shard.reset(size)
+
+    def detach(self):
+        for shard in self.shards:
+            shard.detach()
+
+    def _get_state(self):
+        # Shards may hold different numbers of items. The shorter ones are
+        # padded with items of strength 0 on the oldest end, which neither
+        # stacks nor queues pop or read anything from.
+        states = [shard._get_state() for shard in self.shards]
+        length = max(values.size(1) for values, _ in states)
+        values = torch.cat([F.pad(values, (0, 0, length - values.size(1), 0))
+                            for values, _ in states])
+        strengths = torch.cat([F.pad(strengths, (length - strengths.size(1), 0))
+                               for _, strengths in states])
+        return values, strengths
+
+    def _set_state(self, values, strengths):
+        for shard, shard_values, shard_strengths in zip(
+                self.shards, self._split(values), self._split(strengths)):
+            shard._set_state(shard_values, shard_strengths)
+
+    def _state_header(self):
+        header = super(ShardedStruct, self)._state_header()
+        header["shard_type"] = type(self.shards[0]).__name__
+        return header
+
+    def close(self):
+        """
+        Shuts down the thread pool, if it was created by this
+        ShardedStruct.
+
+        :return: None
+        """
+        if self._owns_executor:
+            self.executor.shutdown()
@@ -0,0 +1,142 @@
+from __future__ import absolute_import
+
+import torch
+
+
+class SharedStructState(object):
+    """
+    Batched state of a SimpleStruct stored in shared memory.
+
+    The values and strengths of all slots are kept in preallocated
+    tensors that are moved to shared memory, so that they can be passed
+    to torch.multiprocessing workers without copying. A worker attaches
+    a contiguous slice of slots to its own SimpleStruct, runs it, and
+    commits the result back. Different workers may operate on disjoint
+    slices concurrently.
+
+    Slots with fewer items than the longest slot in a slice are padded
+    with items of strength 0, which do not affect popping or reading.
+    Committing drops them again, so each slot keeps its own length.
+    Strengths are attached as [batch_size x 1] tensors, following the
+    convention of Struct.forward. The stored state is detached from the
+    autograd graph.
+    """
+
+    def __init__(self, num_slots, embedding_size, capacity,
+                 dtype=torch.float32):
+        """
+        Constructor for the SharedStructState object.
+
+        :type num_slots: int
+        :param num_slots: The number of independent sessions
+
+        :type embedding_size: int
+        :param embedding_size: The size of the vectors stored in the
+            structs
+
+        :type capacity: int
+        :param capacity: The maximum number of items per slot
+        """
+        self.num_slots = num_slots
+        self.embedding_size = embedding_size
+        self.capacity = capacity
+
+        self.values = torch.zeros(num_slots, capacity, embedding_size,
+                                  dtype=dtype).share_memory_()
+        self.strengths = torch.zeros(num_slots, capacity).share_memory_()
+        self.lengths = torch.zeros(num_slots, dtype=torch.long).share_memory_()
+
+    def attach(self, struct, slots):
+        """
+        Replaces the contents of struct with zero-copy views of the
+        shared state in a slice of slots.
+
+        :type struct: SimpleStruct
+        :param struct: A struct whose batch size is the number of slots
+
+        :type slots: slice
+        :param slots: The slots to attach
+
+        :return: None
+        """
+        values = self.values[slots]
+        if values.size(0) != struct.batch_size:
+            raise ValueError("Expected {} slots, got {}.".format(
+                struct.batch_size, values.size(0)))
+
+        lengths = self.lengths[slots]
+        length = int(lengths.max()) if lengths.numel() > 0 else 0
+        strengths = self.strengths[slots]
+        struct._values = [values[:, i] for i in range(length)]
+        struct._strengths = [strengths[:, i:i + 1] for i in range(length)]
+
+    def commit(self, struct, slots):
+        """
+        Writes the contents of struct back into a slice of slots.
+
+        :type struct: SimpleStruct
+        :param struct: A struct previously attached to slots
+
+        :type slots: slice
+        :param slots: The slots to write to
+
+        :return: None
+        """
+        if len(struct) == 0:
+            self.clear(slots)
+            return
+
+        values = torch.stack(struct._values, 1).detach()
+        strengths = torch.stack(struct._strengths, 1).detach()
+        strengths = strengths.view(struct.batch_size, len(struct))
+
+        # Items of strength 0, such as the padding added by self.attach,
+        # do not affect popping or reading. Each slot drops them and moves
+        # its other items together, keeping their order, so that its
+        # length only counts its own items.
+        keep = strengths != 0
+        lengths = keep.sum(1)
+        order = torch.sort((~keep).to(torch.uint8), dim=1, stable=True)[1]
+        values = values.gather(1, order.unsqueeze(-1).expand_as(values))
+        strengths = strengths.gather(1, order)
+        values = torch.where(keep.gather(1, order).unsqueeze(-1), values,
+                             torch.zeros_like(values))
+
+        length = int(lengths.max())
+        if length > self.capacity:
+            raise ValueError("{} items do not fit in capacity {}.".format(
+                length, self.capacity))
+        self.values[slots, :length] = values[:, :length]
+        self.strengths[slots, :length] = strengths[:, :length]
+        self.values[slots, length:] = 0.
+        self.strengths[slots, length:] = 0.
+        self.lengths[slots] = lengths
+
+    def forward(self, struct, slots, *args):
+        """
+        Attaches struct to a slice of slots, runs struct on args, and
+        commits the result.
+
+        :rtype: torch.FloatTensor
+        :return: The output of struct
+        """
+        self.attach(struct, slots)
+        output = struct(*args)
+        self.commit(struct, slots)
+        return output
+
+    def move(self, src, dst):
+        """
+        Moves the session in slot src to slot dst, clearing src.
+
+        :return: None
+        """
+        self.values[dst] = self.values[src]
+        self.strengths[dst] = self.strengths[src]
+        self.lengths[dst] = self.lengths[src]
+        self.clear(src)
+
+    def clear(self, slot):
+        self.values[slot] = 0.
+        self.strengths[slot] = 0.
+        self.lengths[slot] = 0
@@ -4,10 +4,11 @@ from typing import List
 from abc import abstractmethod, abstractproperty
 
 import torch
-from torch.autograd import Variable
 from torch.nn.functional import relu
 
 from stacknn.structs.base import Struct
+from stacknn.utils.instrumentation import instrumented, is_instrumented
+import stacknn.structs.functional as F
 
 
 def tensor_to_string(tensor):
@@ -27,15 +28,13 @@ def to_string(obj):
     """
     Formats a PyTorch object as a string.
 
-    :param obj: A PyTorch object (tensor or Variable)
+    :param obj: A PyTorch object
 
     :rtype: str
     :return: A string description of obj
     """
-    if isinstance(obj, torch.FloatTensor):
-        return tensor_to_string(obj)
-    elif isinstance(obj, Variable):
-        return tensor_to_string(obj.data)
+    if torch.is_tensor(obj):
+        return tensor_to_string(obj.detach())
     else:
         return str(obj)
 
@@ -56,6 +55,23 @@ def bottom(num_steps):
     return 0
 
 
+def to_strength(strength):
+    """
+    Promotes a tensor of strengths to at least single precision, so
+    that the popping and reading cascades stay accurate when the values
+    are stored in half precision.
+
+    :type strength: torch.FloatTensor
+    :param strength: A tensor of strengths
+
+    :rtype: torch.FloatTensor
+    :return: strength with dtype of at least torch.float32
+    """
+    if not torch.is_tensor(strength):
+        return strength
+    return strength.to(torch.promote_types(strength.dtype, torch.float32))
+
+
 class SimpleStruct(Struct):
     """
     Abstract class that subsumes the stack and the queue. This class is
@@ -76,7 +92,8 @@ class SimpleStruct(Struct):
     below for examples.
     """
 
-    def __init__(self, batch_size, embedding_size, remove_zeros=True):
+    def __init__(self, batch_size, embedding_size, remove_zeros=True,
+                 capacity=None, merge_evicted=False, dtype=None):
         """
         Constructor for the SimpleStruct object.
 
@@ -86,9 +103,27 @@ class SimpleStruct(Struct):
         :type embedding_size: int
         :param embedding_size: The size of the vectors stored in this
             SimpleStruct
+
+        :type capacity: int
+        :param capacity: The maximum number of items in this
+            SimpleStruct. When a push exceeds it, the oldest item is
+            evicted, i.e. the bottom of a stack or the front of a queue.
+            If None, the size is unbounded
+
+        :type merge_evicted: bool
+        :param merge_evicted: If True, evicted items are merged into
+            their neighbor instead of being discarded, so that the
+            oldest item acts as a strength-weighted summary of
+            everything beyond the capacity
+
+        :type dtype: torch.dtype
+        :param dtype: The dtype of the vectors stored in this
+            SimpleStruct. See Struct
         """
-        super().__init__(batch_size, embedding_size)
+        super().__init__(batch_size, embedding_size, dtype)
         self.remove_zeros = remove_zeros
+        self.capacity = capacity
+        self.merge_evicted = merge_evicted
 
         # Vector contents on the stack and their corresponding strengths.
         self._values: List[torch.Tensor] = []
@@ -143,8 +178,106 @@ class SimpleStruct(Struct):
         """Are the indices returned by the indices methods increasing?"""
         return NotImplemented
 
+    def _evict_index(self):
+        """
+        Specifies the item that is evicted when the SimpleStruct
+        exceeds its capacity, i.e. the oldest item. For a stack, this is
+        the item farthest from the read end. A queue reads its oldest
+        item first, but evicting the newest one instead would make a
+        full queue drop every new input.
+
+        :rtype: int
+        :return: The index of an item in self._values
+        """
+        return 0
+
     """Implement the abstract operations inherited from base Struct."""
 
+    @instrumented
+    def forward(self, values, pop_strengths, push_strengths,
+                read_strengths=None):
+        """
+        Performs a pop, a push and a read like Struct.forward. When the
+        popping and reading cascades visit the items in the same order,
+        which is the case for Stack and Queue, they are fused into a
+        single pass over the items. Otherwise, and when the SimpleStruct
+        has a capacity, the operations are performed one by one.
+        """
+        if read_strengths is None:
+            read_strengths = torch.ones_like(pop_strengths)
+
+        indices = list(self._pop_indices())
+        if (self.capacity is not None or self._push_index() != len(self)
+                or indices != list(self._read_indices())):
+            return super().forward(values, pop_strengths, push_strengths,
+                                   read_strengths)
+
+        if self.dtype is not None:
+            values = values.to(self.dtype)
+        pop_strength = to_strength(pop_strengths)
+        push_strength = to_strength(push_strengths)
+        strength = to_strength(read_strengths)
+        zeros = torch.zeros_like(pop_strength)
+        decreasing_remove_idxs = []
+
+        # The pushed item goes on top, so it is read first if the cascade
+        # runs top to bottom, and last otherwise.
+        read_pushed_first = not self._increasing_indices()
+        summary = 0.
+        strength_used = 0.
+        if read_pushed_first:
+            summary = self._read_weight(push_strength, strength, 0.) * values
+            strength_used = push_strength
+
+        popping = True
+        iterations = 0
+        for i in indices:
+            iterations += 1
+            if popping:
+                local_strength = relu(self._strengths[i] - pop_strength)
+                pop_strength = relu(pop_strength - self._strengths[i])
+                self._strengths[i] = local_strength
+
+                if (pop_strength == 0).all():
+                    popping = False
+                elif self.remove_zeros and torch.allclose(local_strength, zeros):
+                    if self._increasing_indices():
+                        decreasing_remove_idxs.insert(0, i)
+                    else:
+                        decreasing_remove_idxs.append(i)
+
+            # Accumulate in the precision of the strengths.
+            summary += self._read_weight(self._strengths[i], strength,
+                                         strength_used) * self._values[i]
+            strength_used = strength_used + self._strengths[i]
+            if not popping and (strength_used >= strength).all():
+                break
+
+        if not read_pushed_first:
+            summary += self._read_weight(push_strength, strength,
+                                         strength_used) * values
+
+        if self.remove_zeros:
+            for idx in decreasing_remove_idxs:
+                self._values.pop(idx)
+                self._strengths.pop(idx)
+        self.push(values, push_strength)
+
+        if is_instrumented(self):
+            self._cascade = (iterations, iterations < len(indices))
+        if self.dtype is not None:
+            summary = summary.to(self.dtype)
+        return summary
+
+    def _read_weight(self, item_strength, strength, strength_used):
+        """
+        The [batch_size x 1] strength read from an item, given the
+        strength that the reading cascade has already used.
+        """
+        weight = torch.min(item_strength, relu(strength - strength_used))
+        return weight.view(self.batch_size, 1)
+
+    @instrumented
     def pop(self, strength):
         """
         Popping is done by decreasing the strength of items in the
@@ -157,16 +290,20 @@ class SimpleStruct(Struct):
         is used to decrease the strength of the next item. The order in
         which the items are popped is determined by self._pop_indices.
 
-        :type strength: Variable
+        :type strength: torch.FloatTensor
         :param strength: The total amount of items to pop, measured by
             strength
 
         :return: None
         """
+        strength = to_strength(strength)
         zeros = torch.zeros_like(strength)
         decreasing_remove_idxs = []
+        num_items = len(self)
+        iterations = 0
 
         for i in self._pop_indices():
+            iterations += 1
             local_strength = relu(self._strengths[i] - strength)
             strength = relu(strength - self._strengths[i])
             self._strengths[i] = local_strength
@@ -183,12 +320,16 @@ class SimpleStruct(Struct):
                 else:
                     decreasing_remove_idxs.append(i)
 
+        if is_instrumented(self):
+            self._cascade = (iterations, iterations < num_items)
+
         # Remove indices that are zero, starting at the end.
         if self.remove_zeros:
             for idx in decreasing_remove_idxs:
                 self._values.pop(idx)
                 self._strengths.pop(idx)
 
+    @instrumented
     def push(self, value, strength):
         """
         The push operation inserts a vector and a strength somewhere in
@@ -197,20 +338,56 @@ class SimpleStruct(Struct):
         new item in self._values and self._strengths after the push
         operation is complete.
 
-        :type value: Variable
+        :type value: torch.FloatTensor
         :param value: [batch_size x embedding_size] tensor to be pushed to
         the SimpleStruct
 
-        :type strength: Variable
+        :type strength: torch.FloatTensor
         :param strength: [batch_size] tensor of strengths with which value
         will be pushed
 
         :return: None
         """
+        if self.dtype is not None:
+            value = value.to(self.dtype)
+        strength = to_strength(strength)
+
         push_index = self._push_index()
         self._values.insert(push_index, value)
         self._strengths.insert(push_index, strength)
 
+        if self.capacity is not None and len(self) > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        """
+        Removes the oldest item of the SimpleStruct. If
+        self.merge_evicted is set, the item is instead merged into its
+        neighbor: the merged value is the average of the two values
+        weighted by their strengths, and the merged strength is their
+        sum.
+
+        :return: None
+        """
+        evict_index = self._evict_index()
+        value = self._values.pop(evict_index)
+        strength = self._strengths.pop(evict_index)
+        if not self.merge_evicted or len(self) == 0:
+            return
+
+        # After removal, the neighbor is the new oldest item.
+        neighbor_index = self._evict_index()
+        neighbor_value = self._values[neighbor_index]
+        neighbor_strength = self._strengths[neighbor_index]
+        total_strength = strength + neighbor_strength
+
+        weight = strength / total_strength.clamp(min=1e-12)
+        weight = weight.view(self.batch_size, 1)
+        merged_value = neighbor_value + weight * (value - neighbor_value)
+        self._values[neighbor_index] = merged_value.to(neighbor_value.dtype)
+        self._strengths[neighbor_index] = total_strength
+
+    @instrumented
     def read(self, strength):
         """
         The read operation looks at the first few items on the stack, in
@@ -226,24 +403,122 @@ class SimpleStruct(Struct):
         :param strength: The total amount of vectors to look at,
             measured by their strengths
 
-        :rtype: Variable
+        :rtype: torch.FloatTensor
         :return: The output of the read operation, described above
         """
-        summary = 0.
-        strength_used = 0.
+        device = self._values[0].device if self._values else None
+        strength = torch.as_tensor(to_strength(strength), device=device)
+        strength = strength.reshape(-1, 1).expand(self.batch_size, 1)
+        summary, item_strengths, preceding = self._read_heads(strength)
+
+        if is_instrumented(self) and len(self) > 0:
+            # The reading cascade visits items until the strength read
+            # is used up for every trial.
+            used_up = (preceding + item_strengths >= strength).all(0)
+            iterations = int(used_up.int().argmax()) + 1 if used_up.any() else len(self)
+            self._cascade = (iterations, iterations < len(self))
+        return summary[:, 0]
+
+    @instrumented
+    def read_heads(self, strengths):
+        """
+        Performs several reads at once, e.g. to read both the first item
+        and a deeper summary of the structure. This is equivalent to
+        calling self.read once for each column of strengths, but the
+        reads share one pass over the items and one batched matmul.
 
-        for i in self._read_indices():
-            strength_weight = torch.min(self._strengths[i],
-                                        relu(strength - strength_used))
-            strength_weight = strength_weight.view(self.batch_size, 1)
-            strength_weight = strength_weight.repeat(1, self.embedding_size)
+        :type strengths: torch.FloatTensor
+        :param strengths: [batch_size x K] tensor of the strengths of K
+            reads
 
-            summary += strength_weight * self._values[i]
-            strength_used = strength_used + self._strengths[i]
-            if (strength_used == strength).all():
-                break
+        :rtype: torch.FloatTensor
+        :return: [batch_size x K x embedding_size] tensor of reads
+        """
+        return self._read_heads(to_strength(strengths))[0]
 
-        return summary
+    def _read_heads(self, strengths):
+        """
+        Performs the reads of self.read_heads, and also returns the
+        [batch_size x length] strengths of the items in the order they
+        are read, and the strength read before reaching each of them.
+        """
+        num_reads = strengths.size(-1)
+        if len(self) == 0:
+            empty = strengths.new_zeros(self.batch_size, 0)
+            return (torch.zeros(self.batch_size, num_reads, self.embedding_size,
+                                device=strengths.device, dtype=self.dtype),
+                    empty, empty)
+
+        indices = list(self._read_indices())
+        values = torch.stack([self._values[i] for i in indices], 1)
+        item_strengths = self._item_strengths(indices, strengths.device,
+                                              strengths.dtype)
+
+        # Accumulate in the precision of the strengths.
+        preceding = F.strength_below(item_strengths)
+        summary = F.read_heads(values.to(strengths.dtype), item_strengths,
+                               strengths, preceding)
+        if self.dtype is not None:
+            summary = summary.to(self.dtype)
+        return summary, item_strengths, preceding
+
+    def _item_strengths(self, indices, device=None, dtype=torch.float32):
+        """
+        Collects the strengths of some items, which may have been
+        pushed as floats or [batch_size] or [batch_size x 1] tensors.
+
+        :rtype: torch.FloatTensor
+        :return: [batch_size x len(indices)] tensor of strengths
+        """
+        return torch.cat([
+            torch.as_tensor(self._strengths[i], device=device,
+                            dtype=dtype).reshape(-1, 1)
+            .expand(self.batch_size, 1)
+            for i in indices], 1)
+
+    def _state_header(self):
+        header = super()._state_header()
+        header["capacity"] = self.capacity
+        return header
+
+    def _get_state(self):
+        if len(self) == 0:
+            dtype = self.dtype if self.dtype is not None else torch.float32
+            return (torch.zeros(self.batch_size, 0, self.embedding_size,
+                                dtype=dtype),
+                    torch.zeros(self.batch_size, 0))
+        values = torch.stack(self._values, 1)
+        return values, self._item_strengths(range(len(self)), values.device)
+
+    def _set_state(self, values, strengths):
+        # Like SharedStructState.attach, the items are views of the loaded
+        # tensors rather than copies.
+        self._values = list(values.unbind(1))
+        self._strengths = [strengths[:, i:i + 1] for i in range(values.size(1))]
+
+    def reset(self, batch_size=None):
+        super().reset(batch_size)
+        self._values = []
+        self._strengths = []
+
+    def detach(self):
+        """
+        Detaches self._values and self._strengths from the autograd
+        graph. Since items whose strength is 0 in every batch can no
+        longer be popped or read, they are removed as well.
+
+        :return: None
+        """
+        values = []
+        strengths = []
+        for value, strength in zip(self._values, self._strengths):
+            if (strength == 0).all():
+                continue
+            values.append(value.detach())
+            strengths.append(strength.detach())
+
+        self._values = values
+        self._strengths = strengths
 
     """ Reporting """
 
@@ -0,0 +1,211 @@
+from __future__ import absolute_import
+
+import os
+import tempfile
+
+import torch
+
+from stacknn.structs.simple import Stack, to_strength
+
+
+class ColdStore(object):
+    """
+    A stack of items kept in a memory-mapped file, so that they occupy
+    disk rather than resident memory. Items are copied back into memory
+    when they are popped.
+
+    A temporary file is removed by self.close, on leaving a with block,
+    or at the latest when the ColdStore is garbage collected.
+    """
+
+    def __init__(self, capacity, batch_size, embedding_size,
+                 dtype=torch.float32, path=None):
+        """
+        Constructor for the ColdStore object.
+
+        :type capacity: int
+        :param capacity: The maximum number of items in the store
+
+        :type path: str
+        :param path: The file to map. Strengths are stored next to it
+            with a .strengths suffix. If None, a temporary file is used
+            and removed by self.close
+        """
+        self.capacity = capacity
+        self._owns_path = path is None
+        if path is None:
+            handle, path = tempfile.mkstemp(suffix=".stacknn")
+            os.close(handle)
+        self.path = path
+
+        size = capacity * batch_size
+        self._values = torch.from_file(path, shared=True, size=size * embedding_size,
+                                       dtype=dtype).view(capacity, batch_size, embedding_size)
+        self._strengths = torch.from_file(path + ".strengths", shared=True, size=size,
+                                          dtype=torch.float32).view(capacity, batch_size, 1)
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def push(self, value, strength):
+        if self._length == self.capacity:
+            raise RuntimeError("ColdStore is full with {} items.".format(self.capacity))
+        self._values[self._length].copy_(value)
+        self._strengths[self._length].copy_(strength.reshape(-1, 1))
+        self._length += 1
+
+    def pop(self):
+        self._length -= 1
+        return (self._values[self._length].clone(),
+                self._strengths[self._length].clone())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        if getattr(self, "path", None) is not None:
+            self.close()
+
+    def close(self):
+        self._values = self._strengths = None
+        self._length = 0
+        if self._owns_path:
+            for path in [self.path, self.path + ".strengths"]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+class SpillingStack(Stack):
+    """
+    A neural stack for inference on very deep inputs, which keeps at
+    most hot_depth items in memory. Items further from the top are
+    paged out to a memory-mapped ColdStore, and paged back in only when
+    a popping or reading cascade needs more strength than the items in
+    memory hold.
+
+    The outputs are the same as those of Stack. Since paged-out items
+    are detached, the SpillingStack cannot be used for training. Use it
+    in a with block, or call self.close, to remove the file of the
+    ColdStore as soon as it is no longer needed.
+    """
+
+    def __init__(self, batch_size, embedding_size, hot_depth, spill_capacity,
+                 spill_path=None, **kwargs):
+        """
+        Constructor for the SpillingStack object.
+
+        :type hot_depth: int
+        :param hot_depth: The maximum number of items kept in memory
+
+        :type spill_capacity: int
+        :param spill_capacity: The maximum number of items paged out
+
+        :type spill_path: str
+        :param spill_path: The file to page items out to. See ColdStore
+
+        See SimpleStruct for the other arguments.
+        """
+        super(SpillingStack, self).__init__(batch_size, embedding_size, **kwargs)
+        self.hot_depth = hot_depth
+        self.spill_capacity = spill_capacity
+        self.spill_path = spill_path
+        self._cold = None
+
+    @property
+    def depth(self):
+        """The number of items, both in memory and paged out."""
+        return len(self) + (len(self._cold) if self._cold is not None else 0)
+
+    def forward(self, values, pop_strengths, push_strengths,
+                read_strengths=None):
+        if read_strengths is None:
+            read_strengths = torch.ones_like(pop_strengths)
+        self._page_in(self._to_needed(pop_strengths) + self._to_needed(read_strengths))
+        output = super(SpillingStack, self).forward(values, pop_strengths, push_strengths,
+                                                    read_strengths)
+        self._spill()
+        return output
+
+    def pop(self, strength):
+        self._page_in(self._to_needed(strength))
+        super(SpillingStack, self).pop(strength)
+        self._spill()
+
+    def push(self, value, strength):
+        if torch.is_grad_enabled() and value.requires_grad:
+            raise RuntimeError("SpillingStack can only be used for inference.")
+        super(SpillingStack, self).push(value.detach(), strength)
+        self._spill()
+
+    def read(self, strength):
+        self._page_in(self._to_needed(strength))
+        output = super(SpillingStack, self).read(strength)
+        self._spill()
+        return output
+
+    def read_heads(self, strengths):
+        self._page_in(to_strength(strengths).max(dim=-1)[0])
+        output = super(SpillingStack, self).read_heads(strengths)
+        self._spill()
+        return output
+
+    def reset(self, batch_size=None):
+        self.close()
+        super().reset(batch_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Releases the ColdStore, deleting its file if it is temporary.
+
+        :return: None
+        """
+        if self._cold is not None:
+            self._cold.close()
+            self._cold = None
+
+    def _to_needed(self, strength):
+        if not torch.is_tensor(strength):
+            return torch.full((self.batch_size,), float(strength))
+        return to_strength(strength).reshape(self.batch_size)
+
+    def _page_in(self, needed):
+        """
+        Pages items back in from the top of the ColdStore until the
+        items in memory hold at least the needed strength in every
+        batch.
+        """
+        if self._cold is None or len(self._cold) == 0:
+            return
+        if len(self) > 0:
+            hot_total = self._item_strengths(range(len(self))).sum(1)
+        else:
+            hot_total = torch.zeros(self.batch_size)
+        needed = needed.to(hot_total.device)
+        while len(self._cold) > 0 and (hot_total < needed).any():
+            value, strength = self._cold.pop()
+            self._values.insert(0, value.to(hot_total.device))
+            self._strengths.insert(0, strength.to(hot_total.device))
+            hot_total = hot_total + self._strengths[0].view(self.batch_size)
+
+    def _spill(self):
+        """
+        Pages out the bottom items until at most hot_depth remain.
+        """
+        while len(self) > self.hot_depth:
+            value = self._values.pop(0)
+            strength = self._item_strengths([0], value.device)
+            self._strengths.pop(0)
+            if self._cold is None:
+                self._cold = ColdStore(self.spill_capacity, self.batch_size,
+                                       self.embedding_size, value.dtype, self.spill_path)
+            self._cold.push(value.detach().cpu(), strength.detach().cpu())
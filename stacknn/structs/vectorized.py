@@ -0,0 +1,208 @@
+from __future__ import absolute_import
+
+from abc import abstractmethod
+
+import torch
+
+from stacknn.structs.base import Struct
+from stacknn.utils.instrumentation import instrumented
+import stacknn.structs.functional as F
+
+
+class VectorizedStruct(Struct):
+    """
+    Abstract class for weighted structures whose contents are stored in
+    tensors rather than Python lists. The popping and reading cascades
+    are computed in closed form by the functions in
+    stacknn.structs.functional, so each operation is a fixed number of
+    tensor operations regardless of the number of items, and involves no
+    data-dependent control flow.
+
+    Unlike SimpleStruct, items whose strength reaches 0 are kept until
+    self.detach is called, since removing them would require inspecting
+    the strengths on the host.
+    """
+
+    def __init__(self, batch_size, embedding_size, dtype=None,
+                 num_heads=None):
+        """
+        Constructor for the VectorizedStruct object.
+
+        :type batch_size: int
+        :param batch_size: The number of trials in each mini-batch
+
+        :type embedding_size: int
+        :param embedding_size: The size of the vectors stored in this
+            VectorizedStruct
+
+        :type dtype: torch.dtype
+        :param dtype: The dtype of the vectors stored in this
+            VectorizedStruct. See Struct
+
+        :type num_heads: int
+        :param num_heads: If set, the number of independent structures
+            per trial. Vectors then have shape [batch_size x num_heads x
+            embedding_size] and strengths [batch_size x num_heads]
+        """
+        super().__init__(batch_size, embedding_size, dtype)
+        self.num_heads = num_heads
+        self.values, self.strengths = F.empty_state(batch_size,
+                                                    embedding_size,
+                                                    dtype=dtype,
+                                                    num_heads=num_heads)
+
+    def __len__(self):
+        return self.values.size(-2)
+
+    @instrumented
+    def forward(self, values, pop_strengths, push_strengths,
+                read_strengths=None):
+        """
+        Performs a pop, a push and a read in one functional step. See
+        Struct.forward.
+        """
+        if len(self) == 0:
+            self._adopt(values)
+        state, read_vectors = self._step((self.values, self.strengths), values,
+                                         pop_strengths, push_strengths,
+                                         read_strengths)
+        self.values, self.strengths = state
+        return read_vectors
+
+    @abstractmethod
+    def _step(self, state, values, pop_strengths, push_strengths,
+              read_strengths):
+        raise NotImplementedError("Missing implementation for _step")
+
+    @abstractmethod
+    def _pop(self, strengths, strength):
+        raise NotImplementedError("Missing implementation for _pop")
+
+    @abstractmethod
+    def _read(self, values, strengths, strength):
+        raise NotImplementedError("Missing implementation for _read")
+
+    @abstractmethod
+    def _read_heads(self, values, strengths, strength):
+        raise NotImplementedError("Missing implementation for _read_heads")
+
+    def _to_strength(self, strength):
+        """
+        Converts a float or a [batch_size] or [batch_size x 1] tensor to
+        a [batch_size] tensor of strengths, with an extra [num_heads]
+        dimension if self.num_heads is set.
+        """
+        batch_shape = self.strengths.shape[:-1]
+        if not torch.is_tensor(strength):
+            return torch.full(batch_shape, strength,
+                              device=self.strengths.device,
+                              dtype=self.strengths.dtype)
+        strength = strength.to(torch.promote_types(strength.dtype, torch.float32))
+        return strength.reshape(batch_shape)
+
+    def _adopt(self, value):
+        """
+        Moves the empty contents to the device, and unless self.dtype is
+        set, the dtype of the first value pushed.
+        """
+        dtype = self.dtype if self.dtype is not None else value.dtype
+        self.values = self.values.to(device=value.device, dtype=dtype)
+        self.strengths = self.strengths.to(device=value.device)
+
+    @instrumented
+    def pop(self, strength):
+        self.strengths = self._pop(self.strengths, self._to_strength(strength))
+
+    @instrumented
+    def push(self, value, strength):
+        if len(self) == 0:
+            self._adopt(value)
+        self.values, self.strengths = F.push(self.values, self.strengths,
+                                             value, self._to_strength(strength))
+
+    @instrumented
+    def read(self, strength):
+        return self._read(self.values, self.strengths,
+                          self._to_strength(strength))
+
+    @instrumented
+    def read_heads(self, strengths):
+        """
+        Performs several reads at once. See SimpleStruct.read_heads.
+
+        :type strengths: torch.FloatTensor
+        :param strengths: [batch_size x K] read strengths, with an extra
+            [num_heads] dimension if self.num_heads is set
+
+        :rtype: torch.FloatTensor
+        :return: [batch_size x K x embedding_size] tensor of reads
+        """
+        strengths = strengths.to(self.strengths.dtype)
+        return self._read_heads(self.values, self.strengths, strengths)
+
+    def _state_header(self):
+        header = super()._state_header()
+        header["num_heads"] = self.num_heads
+        return header
+
+    def _get_state(self):
+        return self.values, self.strengths
+
+    def _set_state(self, values, strengths):
+        self.values, self.strengths = values, strengths
+
+    def reset(self, batch_size=None):
+        super().reset(batch_size)
+        self.values, self.strengths = F.empty_state(self.batch_size,
+                                                    self.embedding_size,
+                                                    dtype=self.dtype,
+                                                    num_heads=self.num_heads)
+
+    def detach(self):
+        """
+        Detaches the contents from the autograd graph and removes items
+        whose strength is 0 in every batch.
+
+        :return: None
+        """
+        alive = (self.strengths != 0).flatten(0, -2).any(dim=0)
+        self.values = self.values[..., alive, :].detach()
+        self.strengths = self.strengths[..., alive].detach()
+
+
+class VectorizedStack(VectorizedStruct):
+    """
+    A neural stack (last in, first out) computing the same outputs as
+    stacknn.structs.Stack.
+    """
+
+    def _step(self, *args):
+        return F.stack_step(*args)
+
+    def _pop(self, strengths, strength):
+        return F.pop_stack(strengths, strength)
+
+    def _read(self, values, strengths, strength):
+        return F.read_stack(values, strengths, strength)
+
+    def _read_heads(self, values, strengths, strength):
+        return F.read_stack_heads(values, strengths, strength)
+
+
+class VectorizedQueue(VectorizedStruct):
+    """
+    A neural queue (first in, first out) computing the same outputs as
+    stacknn.structs.Queue.
+    """
+
+    def _step(self, *args):
+        return F.queue_step(*args)
+
+    def _pop(self, strengths, strength):
+        return F.pop_queue(strengths, strength)
+
+    def _read(self, values, strengths, strength):
+        return F.read_queue(values, strengths, strength)
+
+    def _read_heads(self, values, strengths, strength):
+        return F.read_queue_heads(values, strengths, strength)
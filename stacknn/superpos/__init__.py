@@ -1,7 +1,37 @@
-from stacknn.superpos.stack import Stack
-from stacknn.superpos.noop_stack import NoOpStack
-from stacknn.superpos.minimalist_stack import MinimalistStack
-from stacknn.superpos.multipop_stack import MultiPopStack
-from stacknn.superpos.multipush_stack import MultiPushStack
-from stacknn.superpos.rewrite_stack import RewriteStack
-from stacknn.superpos.transition_parser_stack import TransitionParserStack
+"""Superposition-based differentiable stacks.
+
+Each class is imported from its module on first access, so that importing the package only costs
+what is actually used.
+"""
+
+import importlib
+
+# The module defining each public name.
+_EXPORTS = {
+    "Stack": "stack",
+    "NoOpStack": "noop_stack",
+    "MinimalistStack": "minimalist_stack",
+    "MultiPopStack": "multipop_stack",
+    "MultiPushStack": "multipush_stack",
+    "RewriteStack": "rewrite_stack",
+    "TransitionParserStack": "transition_parser_stack",
+    "Queue": "queue",
+    "Deque": "deque",
+    "StackSessionPool": "session_pool",
+    "SharedTapes": "shared",
+    "StackModule": "module",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,14 +1,50 @@
 from abc import ABCMeta, abstractmethod
 import torch
-from typing import Optional
+from typing import Dict, Optional
+
+from stacknn.utils import state
+from stacknn.utils.pool import TensorPool
+
+
+def overrides(method):
+    """Mark a method as overriding one of a base class, which is checked when the class is created.
+
+    This replaces the overrides package, which inspects the calling frame and is slow to import.
+    """
+    method.__override__ = True
+    return method
 
 
 class AbstractStack(metaclass=ABCMeta):
 
-    def __init__(self, stack_dim: int, max_depth: Optional[int] = None):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, attr in vars(cls).items():
+            method = getattr(attr, "__func__", attr)
+            if getattr(method, "__override__", False) and \
+                    not any(hasattr(base, name) for base in cls.__mro__[1:]):
+                raise TypeError("{}.{} does not override any method.".format(cls.__name__, name))
+
+    def __init__(self,
+                 stack_dim: int,
+                 max_depth: Optional[int] = None,
+                 summary_decay: Optional[float] = None,
+                 num_heads: Optional[int] = None):
+        """If summary_decay is set, rows that overflow max_depth are folded into a summary row at the
+        bottom of the tapes instead of being discarded. See functional.base.enforce_max_depth.
+
+        If num_heads is set, each example has num_heads independent stacks, which are all updated by
+        one vectorized call. The tapes then have shape [batch_size, num_heads, depth, stack_dim], and
+        update takes policies of shape [batch_size, num_heads, num_actions] and vectors of shape
+        [batch_size, num_heads, stack_dim].
+        """
         self.stack_dim = stack_dim
         self.max_depth = max_depth
+        self.summary_decay = summary_decay
+        self.num_heads = num_heads
         self.tapes: torch.FloatTensor = None
+        self.pool: Optional[TensorPool] = None
+        self._pooled_tapes: Optional[torch.FloatTensor] = None
 
     @classmethod
     def empty(cls,
@@ -16,14 +52,71 @@ class AbstractStack(metaclass=ABCMeta):
               stack_dim: int,
               max_depth: Optional[int] = None,
               device: Optional[int] = None,
+              dtype: Optional[torch.dtype] = None,
+              pool: Optional[TensorPool] = None,
               **kwargs):
         stack = cls(stack_dim, max_depth=max_depth, **kwargs)
-        stack.reset(batch_size, device=device)
+        stack.pool = pool
+        stack.reset(batch_size, device=device, dtype=dtype)
         return stack
 
-    def reset(self, batch_size: int, device: Optional[int] = None) -> None:
+    def reset(self,
+              batch_size: int,
+              device: Optional[int] = None,
+              dtype: Optional[torch.dtype] = None) -> None:
+        """Empty the stack. The updates keep the dtype of the tapes, e.g. torch.bfloat16."""
+        self._set_tapes(None, None)
         del self.tapes
-        self.tapes = torch.zeros(batch_size, 0, self.stack_dim, device=device)
+        batch_shape = [batch_size] if self.num_heads is None else [batch_size, self.num_heads]
+        self.tapes = torch.zeros(*batch_shape, 0, self.stack_dim, device=device, dtype=dtype)
+
+    def detach(self) -> None:
+        """Cut the autograd history of the tapes, e.g. for truncated backpropagation through time."""
+        self.tapes = self.tapes.detach()
+
+    def _acquire_tapes(self, growth: int) -> Optional[torch.FloatTensor]:
+        """Acquire a view of a pooled buffer for tapes that are growth rows deeper than the current ones.
+
+        The pool is only used without autograd, e.g. under torch.no_grad(). The tapes returned by
+        update then stay valid only until the next update or reset, which recycles their buffer.
+
+        Buffers are rounded up to a power of two rows. Without max_depth, the tapes grow by a row at
+        every update, so exact shapes would never be asked for twice. With rounding, two buffers per
+        power of two serve every depth up to it, and the pool holds O(log depth) buffers.
+        """
+        if self.pool is None or torch.is_grad_enabled():
+            return None
+        depth = self.tapes.size(-2) + growth
+        capacity = 1 << max(depth - 1, 0).bit_length()
+        shape = self.tapes.shape[:-2] + (capacity, self.stack_dim)
+        buffer = self.pool.acquire(shape, self.tapes.dtype, self.tapes.device)
+        return buffer[..., :depth, :]
+
+    def _set_tapes(self, tapes: torch.FloatTensor, out: Optional[torch.FloatTensor]) -> None:
+        """Replace the tapes, releasing the pooled buffer of the old ones. out is the view returned
+        by _acquire_tapes, if any."""
+        if self._pooled_tapes is not None:
+            self.pool.release(self._pooled_tapes)
+        self._pooled_tapes = out._base if out is not None else None
+        self.tapes = tapes
+
+    def save_state(self, path: str) -> None:
+        """Save the contents of the stack to path, e.g. to suspend a streaming session."""
+        state.save_state(path, self._state_header(), self._state_tensors())
+
+    def load_state(self, path: str, mmap: bool = True) -> None:
+        """Restore contents saved by save_state into a stack of the same type and shape.
+
+        With mmap, the tapes are mapped from the file rather than read, and stay on the CPU.
+        """
+        for name, tensor in state.load_state(path, self._state_header(), mmap).items():
+            setattr(self, name, tensor)
+
+    def _state_header(self) -> Dict:
+        return {"type": type(self).__name__, "stack_dim": self.stack_dim, "num_heads": self.num_heads}
+
+    def _state_tensors(self) -> Dict[str, torch.Tensor]:
+        return {"tapes": self.tapes}
 
     @abstractmethod
     def update(self,
@@ -36,3 +129,33 @@ class AbstractStack(metaclass=ABCMeta):
     def get_num_actions(self) -> int:
         """This can be either a class or instance method depending on the stack type."""
         return NotImplemented
+
+
+class AbstractQueue(AbstractStack):
+
+    """Base class for the queue-like structures, which also grow at the back.
+
+    The position of the back varies across the superposition, so besides the tapes these keep an
+    occupancy of shape [batch_size, depth]: the probability that each row holds an item. The front is
+    row 0 of the tapes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.occupancy: torch.FloatTensor = None
+
+    def reset(self,
+              batch_size: int,
+              device: Optional[int] = None,
+              dtype: Optional[torch.dtype] = None) -> None:
+        super().reset(batch_size, device=device, dtype=dtype)
+        # Like the weighted strengths, occupancy is kept in at least single precision.
+        dtype = torch.promote_types(self.tapes.dtype, torch.float32)
+        self.occupancy = torch.zeros(self.tapes.shape[:-1], device=device, dtype=dtype)
+
+    def detach(self) -> None:
+        super().detach()
+        self.occupancy = self.occupancy.detach()
+
+    def _state_tensors(self) -> Dict[str, torch.Tensor]:
+        return {"tapes": self.tapes, "occupancy": self.occupancy}
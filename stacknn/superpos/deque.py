@@ -0,0 +1,27 @@
+import torch
+
+from stacknn.utils.instrumentation import instrumented
+from .base import AbstractQueue, overrides
+from . import functional as F
+
+
+class Deque(AbstractQueue):
+
+    """A superposition double-ended queue. The actions are, in order: push to the front, pop from the
+    front, push to the back, and pop from the back. The front is row 0 of the tapes.
+    """
+
+    @instrumented
+    @overrides
+    def update(self,
+               policies: torch.FloatTensor,  # Distribution of shape [batch_size, 4].
+               new_vecs: torch.FloatTensor   # Vectors of shape [batch_size, stack_dim].
+              ) -> torch.FloatTensor:
+        self.tapes, self.occupancy = F.update_deque(self.tapes, self.occupancy, policies, new_vecs,
+                                                    self.max_depth, self.summary_decay)
+        return self.tapes
+
+    @classmethod
+    @overrides
+    def get_num_actions(cls) -> int:
+        return 4
@@ -5,3 +5,5 @@ from .multipush_stack import update_kpush_stack
 from .minimalist_stack import update_minimalist_stack
 from .rewrite_stack import update_rewrite_stack
 from .transition_parser_stack import update_transition_parser_stack
+from .queue import update_queue
+from .deque import update_deque
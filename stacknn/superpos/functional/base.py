@@ -1,8 +1,57 @@
-from typing import Optional
+from typing import List, Optional
 import torch
+import torch.nn.functional as F
 
 
-def enforce_max_depth(tapes: torch.FloatTensor, max_depth: Optional[int] = None) -> torch.FloatTensor:
-    if max_depth is not None:
-        return tapes[:, :max_depth, :]
-    return tapes
\ No newline at end of file
+def pad_depth(tapes: torch.Tensor, depth: int) -> torch.Tensor:
+    """Zero-pad or truncate tapes at the bottom so that they have exactly depth rows.
+
+    This replaces branching on the current length, which keeps the updates scriptable and lets
+    torch.compile capture them as a single graph.
+
+    Like the updates, this only indexes tapes from the right, as [..., depth, stack_dim], so that any
+    leading dimensions are allowed. This is what makes the updates compatible with torch.func.vmap.
+    """
+    padding = max(depth - tapes.size(-2), 0)
+    return F.pad(tapes, [0, 0, 0, padding])[..., :depth, :]
+
+
+def enforce_max_depth(tapes: torch.Tensor,
+                      max_depth: Optional[int] = None,
+                      summary_decay: Optional[float] = None,
+                     ) -> torch.Tensor:
+    """Truncate tapes to max_depth rows.
+
+    By default, rows below max_depth are discarded. If summary_decay is set, they are instead folded
+    into the bottom row, which then acts as a running summary of everything that overflowed:
+    summary_decay=1. keeps their plain sum, and smaller values give a decayed accumulator.
+    """
+    if max_depth is None or tapes.size(-2) <= max_depth:
+        return tapes
+    if summary_decay is None:
+        return tapes[..., :max_depth, :]
+
+    overflow = tapes[..., max_depth:, :].sum(dim=-2, keepdim=True)
+    summary = tapes[..., max_depth - 1:max_depth, :] + summary_decay * overflow
+    return torch.cat([tapes[..., :max_depth - 1, :], summary], dim=-2)
+
+
+def mix(policies: torch.Tensor,            # Distribution of shape [batch_size, num_actions, 1, 1].
+        candidates: List[torch.Tensor],   # The tapes resulting from each action.
+        out: Optional[torch.Tensor] = None,
+       ) -> torch.Tensor:
+    """Sum the candidate tapes weighted by the policies.
+
+    If out is given, the sum is accumulated into it in place instead of allocating new tensors,
+    e.g. to reuse buffers from a stacknn.utils.pool.TensorPool. This does not support autograd.
+    """
+    if out is None:
+        tapes = policies[..., 0, :, :] * candidates[0]
+        for i in range(1, len(candidates)):
+            tapes = tapes + policies[..., i, :, :] * candidates[i]
+        return tapes
+
+    torch.mul(policies[..., 0, :, :], candidates[0], out=out)
+    for i in range(1, len(candidates)):
+        out.addcmul_(policies[..., i, :, :], candidates[i])
+    return out
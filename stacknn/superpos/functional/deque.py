@@ -0,0 +1,45 @@
+from typing import Optional, Tuple
+import torch
+import torch.nn.functional as F
+
+from stacknn.superpos.functional.base import enforce_max_depth, pad_depth
+from stacknn.superpos.functional.queue import dequeue, enqueue, pad_occupancy
+
+
+def update_deque(tapes: torch.Tensor,
+                 occupancy: torch.Tensor,  # Probabilities of shape [batch_size, depth].
+                 policies: torch.Tensor,   # Distribution of shape [batch_size, 4].
+                 new_vecs: torch.Tensor,   # Vectors of shape [batch_size, stack_dim].
+                 max_depth: Optional[int] = None,
+                 summary_decay: Optional[float] = None,
+                ) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Push to the front, pop from the front, push to the back, or pop from the back.
+
+    The front is row 0 of the tapes. See update_queue.
+    """
+    length = tapes.size(-2)
+    new_vecs = new_vecs.to(tapes.dtype).unsqueeze(dim=-2)
+
+    # Push and pop at the front.
+    push_front_tapes = torch.cat([new_vecs, tapes], dim=-2)
+    push_front_occupancy = F.pad(occupancy, [1, 0], value=1.)
+    pop_front_tapes, pop_front_occupancy = dequeue(tapes, occupancy)
+
+    # Push at the back.
+    push_back_tapes, push_back_occupancy = enqueue(tapes, occupancy, new_vecs)
+
+    # Pop at the back: the probability that row i is the last item is occupancy[i] - occupancy[i + 1].
+    below = pad_occupancy(occupancy[..., 1:], length)
+    weights = (occupancy - below).to(tapes.dtype).unsqueeze(-1)
+    pop_back_tapes = pad_depth(tapes * (1. - weights), length + 1)
+    pop_back_occupancy = pad_occupancy(below, length + 1)
+
+    all_tapes = torch.stack([push_front_tapes, pop_front_tapes, push_back_tapes, pop_back_tapes], dim=-3)
+    all_occupancy = torch.stack([push_front_occupancy, pop_front_occupancy, push_back_occupancy,
+                                 pop_back_occupancy], dim=-2)
+    tapes = (policies.to(tapes.dtype).unsqueeze(-1).unsqueeze(-1) * all_tapes).sum(dim=-3)
+    occupancy = (policies.to(occupancy.dtype).unsqueeze(-1) * all_occupancy).sum(dim=-2)
+
+    if max_depth is not None:
+        occupancy = occupancy[..., :max_depth]
+    return enforce_max_depth(tapes, max_depth, summary_decay), occupancy
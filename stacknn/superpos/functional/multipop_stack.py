@@ -4,29 +4,27 @@ import torch
 from .base import enforce_max_depth
 
 
-def update_kpop_stack(tapes: torch.FloatTensor,
-                      policies: torch.FloatTensor,  # Distribution of shape [batch_size, num_actions].
-                      new_vecs: torch.FloatTensor,  # Vectors of shape [batch_size, stack_dim].
+def update_kpop_stack(tapes: torch.Tensor,
+                      policies: torch.Tensor,  # Distribution of shape [batch_size, num_actions].
+                      new_vecs: torch.Tensor,  # Vectors of shape [batch_size, stack_dim].
                       num_actions: int,
                       max_depth: Optional[int] = None,
-                     ) -> torch.FloatTensor:
-        batch_size, length, stack_dim = tapes.size()
-        device = tapes.device
+                      summary_decay: Optional[float] = None,
+                     ) -> torch.Tensor:
+    length = tapes.size(-2)
+    dtype = tapes.dtype
+    policies = policies.to(dtype)
 
-        policies = policies.unsqueeze(-1).unsqueeze(-1)
-        new_tapes = torch.empty(batch_size, num_actions, length + 1, stack_dim, device=device)
+    # Popping k elements drops the bottom k rows of the old stack. The row weights sum the
+    # probabilities of the actions that keep each row.
+    actions = torch.arange(num_actions, device=tapes.device)
+    rows = torch.arange(length, device=tapes.device)
+    kept = (rows.unsqueeze(0) < length - actions.unsqueeze(1)).to(dtype)
+    popped_tapes = tapes * torch.matmul(policies, kept).unsqueeze(-1)
 
-        for action in range(num_actions):
-            new_tapes[:, action, 0, :] = new_vecs
+    # Every action pushes the new vector after popping.
+    push_weights = policies.sum(dim=-1, keepdim=True)
+    new_vecs = (push_weights * new_vecs.to(dtype)).unsqueeze(dim=-2)
 
-            if action <= length:
-                # Remove action-many elements from the stack.
-                new_tapes[:, action, 1:1 + length - action, :] = tapes[:, :length - action, :]
-                new_tapes[:, action, 1 + length - action:, :] = 0.
-            else:
-                # Remove everything from the stack.
-                new_tapes[:, action, 1:, :] = 0.
-
-        new_tapes = policies * new_tapes
-        new_tapes = torch.sum(new_tapes, dim=1)
-        return enforce_max_depth(new_tapes, max_depth)
+    new_tapes = torch.cat([new_vecs, popped_tapes], dim=-2)
+    return enforce_max_depth(new_tapes, max_depth, summary_decay)
@@ -1,33 +1,34 @@
 from typing import Optional
 import torch
+import torch.nn.functional as F
 
-from .base import enforce_max_depth
+from .base import enforce_max_depth, pad_depth
 
 
-def update_kpush_stack(tapes: torch.FloatTensor,
-                       policies: torch.FloatTensor,  # Distribution of shape [batch_size, num_actions].
-                       new_vecs: torch.FloatTensor,  # Vectors of shape [batch_size, stack_dim].
+def update_kpush_stack(tapes: torch.Tensor,
+                       policies: torch.Tensor,  # Distribution of shape [batch_size, num_actions].
+                       new_vecs: torch.Tensor,  # Vectors of shape [batch_size, stack_dim].
                        num_actions: int,
-                       max_depth: Optional[int],
-                      ) -> torch.FloatTensor:
-        batch_size, length, stack_dim = tapes.size()
-        device = tapes.device
+                       max_depth: Optional[int] = None,
+                       summary_decay: Optional[float] = None,
+                      ) -> torch.Tensor:
+    length = tapes.size(-2)
+    dtype = tapes.dtype
+    policies = policies.to(dtype)
+    new_length = length + num_actions
 
-        new_vecs = new_vecs.unsqueeze(1)
-        policies = policies.unsqueeze(-1).unsqueeze(-1)
-        new_tapes = torch.empty(batch_size, num_actions, length + num_actions, stack_dim, device=device)
+    # After pushing k copies of the new vector, row i of the old stack (except the popped top) is
+    # row i + k - 1 of the new stack. Shifting down by k is indexing a top-padded stack at i - k.
+    padded_tapes = F.pad(tapes[..., 1:, :], [0, 0, num_actions, 0])
+    padded_tapes = pad_depth(padded_tapes, new_length + num_actions)
+    actions = torch.arange(num_actions, device=tapes.device)
+    rows = torch.arange(new_length, device=tapes.device)
+    indices = (rows.unsqueeze(0) - actions.unsqueeze(1) + num_actions).flatten()
+    shifted_tapes = padded_tapes.index_select(-2, indices).unflatten(-2, [num_actions, new_length])
+    shifted_tapes = torch.sum(policies.unsqueeze(-1).unsqueeze(-1) * shifted_tapes, dim=-3)
 
-        for action in range(num_actions):
-            stacked_new_vecs = new_vecs.repeat(1, action, 1)
-            new_tapes[:, action, :action, :] = stacked_new_vecs
-
-            if length > 0:
-                cutoff = action + length - 1
-                new_tapes[:, action, action:cutoff, :] = tapes[:, 1:, :]
-                new_tapes[:, action, cutoff:, :] = 0.
-            else:
-                new_tapes[:, action, action:, :] = 0.
-
-        new_tapes = policies * new_tapes
-        new_tapes = torch.sum(new_tapes, dim=1)
-        return enforce_max_depth(new_tapes, max_depth)
+    # Row i holds the new vector under every action that pushes more than i copies.
+    push_weights = policies.flip(-1).cumsum(-1).flip(-1)
+    push_weights = F.pad(push_weights[..., 1:], [0, new_length - num_actions + 1])
+    new_tapes = push_weights.unsqueeze(-1) * new_vecs.to(dtype).unsqueeze(-2) + shifted_tapes
+    return enforce_max_depth(new_tapes, max_depth, summary_decay)
@@ -0,0 +1,65 @@
+from typing import Optional, Tuple
+import torch
+import torch.nn.functional as F
+
+from stacknn.superpos.functional.base import enforce_max_depth, pad_depth
+
+
+def pad_occupancy(occupancy: torch.Tensor, depth: int) -> torch.Tensor:
+    """Zero-pad or truncate an occupancy vector at the back so that it has exactly depth entries."""
+    padding = max(depth - occupancy.size(-1), 0)
+    return F.pad(occupancy, [0, padding])[..., :depth]
+
+
+def enqueue(tapes: torch.Tensor,
+            occupancy: torch.Tensor,
+            new_vecs: torch.Tensor,  # Vectors of shape [batch_size, 1, stack_dim].
+           ) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Write new_vecs into the first free row, with depth + 1 rows in the result.
+
+    Unlike a stack, a queue grows at the back, whose position varies across the superposition. It is
+    tracked by the occupancy, the probability that each row holds an item. Since occupancy is
+    non-increasing, the probability that row i is the first free one is occupancy[i - 1] -
+    occupancy[i], which is exact for one-hot policies and leaves no gaps between items.
+    """
+    length = tapes.size(-2)
+    occupied = F.pad(occupancy, [1, 0], value=1.)
+    weights = occupied - pad_occupancy(occupancy, length + 1)
+    tapes = pad_depth(tapes, length + 1) + weights.to(tapes.dtype).unsqueeze(-1) * new_vecs
+    return tapes, occupied
+
+
+def dequeue(tapes: torch.Tensor,
+            occupancy: torch.Tensor,
+           ) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Remove the front row, with depth + 1 rows in the result."""
+    length = tapes.size(-2)
+    tapes = pad_depth(tapes[..., 1:, :], length + 1)
+    occupancy = pad_occupancy(occupancy[..., 1:], length + 1)
+    return tapes, occupancy
+
+
+def update_queue(tapes: torch.Tensor,
+                 occupancy: torch.Tensor,  # Probabilities of shape [batch_size, depth].
+                 policies: torch.Tensor,   # Distribution of shape [batch_size, 2].
+                 new_vecs: torch.Tensor,   # Vectors of shape [batch_size, stack_dim].
+                 max_depth: Optional[int] = None,
+                 summary_decay: Optional[float] = None,
+                ) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Enqueue at the back or dequeue from the front, which is row 0 of the tapes.
+
+    Returns the new tapes and occupancy. Overflow past max_depth is handled as for the stacks, so
+    that a full queue drops (or with summary_decay, summarizes) what is enqueued.
+    """
+    new_vecs = new_vecs.to(tapes.dtype).unsqueeze(dim=-2)
+    enqueue_tapes, enqueue_occupancy = enqueue(tapes, occupancy, new_vecs)
+    dequeue_tapes, dequeue_occupancy = dequeue(tapes, occupancy)
+
+    weights = policies.to(occupancy.dtype).unsqueeze(-1)
+    occupancy = weights[..., 0, :] * enqueue_occupancy + weights[..., 1, :] * dequeue_occupancy
+    policies = policies.to(tapes.dtype).unsqueeze(-1).unsqueeze(-1)
+    tapes = policies[..., 0, :, :] * enqueue_tapes + policies[..., 1, :, :] * dequeue_tapes
+
+    if max_depth is not None:
+        occupancy = occupancy[..., :max_depth]
+    return enforce_max_depth(tapes, max_depth, summary_decay), occupancy
@@ -1,33 +1,27 @@
 from typing import Optional
 import torch
 
-from stacknn.superpos.functional.base import enforce_max_depth
+from stacknn.superpos.functional.base import enforce_max_depth, mix, pad_depth
 
 
-def update_stack(tapes: torch.FloatTensor,
-                 policies: torch.FloatTensor,
-                 new_vecs: torch.FloatTensor,
-                 max_depth: int = Optional[int]
-                ) -> torch.FloatTensor:
-    batch_size, length, stack_dim = tapes.size()
-    device = tapes.device
+def update_stack(tapes: torch.Tensor,
+                 policies: torch.Tensor,  # Distribution of shape [batch_size, 2].
+                 new_vecs: torch.Tensor,  # Vectors of shape [batch_size, stack_dim].
+                 max_depth: Optional[int] = None,
+                 summary_decay: Optional[float] = None,
+                 out: Optional[torch.Tensor] = None,
+                ) -> torch.Tensor:
+    length = tapes.size(-2)
+    dtype = tapes.dtype
+    new_vecs = new_vecs.to(dtype).unsqueeze(dim=-2)
 
-    if length == 0:
-        push_tapes = new_vecs.unsqueeze(dim=1)
-        pop_tapes = torch.zeros(batch_size, 1, stack_dim, device=device)
+    # Push operation.
+    push_tapes = torch.cat([new_vecs, tapes], dim=-2)
 
-    else:
-        # Push operation.
-        push_tapes = torch.empty(batch_size, length + 1, stack_dim, device=device)
-        push_tapes[:, 0, :] = new_vecs
-        push_tapes[:, 1:, :] = tapes
+    # Pop operation.
+    pop_tapes = pad_depth(tapes[..., 1:, :], length + 1)
 
-        # Pop operation.
-        pop_tapes = torch.empty(batch_size, length + 1, stack_dim, device=device)
-        pop_tapes[:, :-2, :] = tapes[:, 1:]
-        pop_tapes[:, -2:, :] = 0.
+    policies = policies.to(dtype).unsqueeze(-1).unsqueeze(-1)
+    tapes = mix(policies, [push_tapes, pop_tapes], out)
 
-    policies = policies.unsqueeze(-1).unsqueeze(-1)
-    tapes = policies[:, 0] * push_tapes + policies[:, 1] * pop_tapes
-
-    return enforce_max_depth(tapes, max_depth)
\ No newline at end of file
+    return enforce_max_depth(tapes, max_depth, summary_decay)
@@ -0,0 +1,52 @@
+from typing import Optional
+
+import torch
+import torch.nn as nn
+
+from .base import AbstractStack
+
+
+class StackModule(nn.Module):
+
+    """Wraps an AbstractStack as an nn.Module, so that it can be a submodule of a model, e.g. one
+    trained with torch.nn.parallel.DistributedDataParallel.
+
+    The tapes stay a plain attribute of the wrapped stack rather than a registered buffer: they hold
+    the contents for the local batch of one process, so they must not be broadcast to the other
+    processes, saved in state_dict, or moved by Module.to. Call reset at the start of every batch.
+    """
+
+    def __init__(self, stack: AbstractStack):
+        super().__init__()
+        self.stack = stack
+
+    @property
+    def tapes(self) -> Optional[torch.FloatTensor]:
+        return self.stack.tapes
+
+    def get_num_actions(self) -> int:
+        return self.stack.get_num_actions()
+
+    def reset(self,
+              batch_size: int,
+              device: Optional[int] = None,
+              dtype: Optional[torch.dtype] = None) -> None:
+        """Empty the stack, e.g. for a new batch whose size may differ between processes."""
+        self.stack.reset(batch_size, device=device, dtype=dtype)
+
+    def detach(self) -> None:
+        self.stack.detach()
+
+    def forward(self,
+                policies: torch.FloatTensor,  # Distribution of shape [batch_size, num_actions].
+                new_vecs: torch.FloatTensor   # Vectors of shape [batch_size, stack_dim].
+               ) -> torch.FloatTensor:
+        """Update the stack and return its tapes. A stack that was never reset is emptied for the
+        batch size, device and dtype of new_vecs first."""
+        if self.stack.tapes is None:
+            self.reset(new_vecs.size(0), device=new_vecs.device, dtype=new_vecs.dtype)
+        return self.stack.update(policies, new_vecs)
+
+    def extra_repr(self) -> str:
+        return "{}(stack_dim={}, max_depth={})".format(
+            type(self.stack).__name__, self.stack.stack_dim, self.stack.max_depth)
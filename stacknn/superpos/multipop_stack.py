@@ -1,8 +1,8 @@
-from overrides import overrides
 import torch
 from typing import Optional
 
-from .base import AbstractStack
+from stacknn.utils.instrumentation import instrumented
+from .base import AbstractStack, overrides
 from . import functional as F
 
 
@@ -17,16 +17,20 @@ class MultiPopStack(AbstractStack):
     def __init__(self,
                  stack_dim: int,
                  max_depth: Optional[int] = None,
-                 num_actions: Optional[int] = 6):
-        super().__init__(stack_dim, max_depth)
+                 num_actions: Optional[int] = 6,
+                 summary_decay: Optional[float] = None,
+                 num_heads: Optional[int] = None):
+        super().__init__(stack_dim, max_depth, summary_decay, num_heads)
         self.num_actions = num_actions
 
+    @instrumented
     @overrides
     def update(self,
                policies: torch.FloatTensor,  # Distribution of shape [batch_size, num_actions].
                new_vecs: torch.FloatTensor   # Vectors of shape [batch_size, stack_dim].
               ) -> torch.FloatTensor:
-        self.tapes = F.update_kpop_stack(self.tapes, policies, new_vecs, self.num_actions, self.max_depth)
+        self.tapes = F.update_kpop_stack(self.tapes, policies, new_vecs, self.num_actions, self.max_depth,
+                                         self.summary_decay)
         return self.tapes
 
     @overrides
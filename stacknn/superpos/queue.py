@@ -0,0 +1,27 @@
+import torch
+
+from stacknn.utils.instrumentation import instrumented
+from .base import AbstractQueue, overrides
+from . import functional as F
+
+
+class Queue(AbstractQueue):
+
+    """A superposition queue that must either enqueue at the back or dequeue from the front at each
+    time step. The front of the queue is row 0 of the tapes.
+    """
+
+    @instrumented
+    @overrides
+    def update(self,
+               policies: torch.FloatTensor,  # Distribution of shape [batch_size, 2].
+               new_vecs: torch.FloatTensor   # Vectors of shape [batch_size, stack_dim].
+              ) -> torch.FloatTensor:
+        self.tapes, self.occupancy = F.update_queue(self.tapes, self.occupancy, policies, new_vecs,
+                                                    self.max_depth, self.summary_decay)
+        return self.tapes
+
+    @classmethod
+    @overrides
+    def get_num_actions(cls) -> int:
+        return 2
@@ -1,8 +1,8 @@
-from overrides import overrides
 import torch
 from typing import Optional
 
-from .base import AbstractStack
+from stacknn.utils.instrumentation import instrumented
+from .base import AbstractStack, overrides
 from . import functional as F
 
 
@@ -12,12 +12,16 @@ class RewriteStack(AbstractStack):
     the top element of the stack.
     """
 
+    @instrumented
     @overrides
     def update(self,
                policies: torch.FloatTensor,  # Distribution of shape [batch_size, 3].
                new_vecs: torch.FloatTensor   # Vectors of shape [batch_size, stack_dim].
               ) -> torch.FloatTensor:
-        self.tapes = F.update_rewrite_stack(self.tapes, policies, new_vecs, self.max_depth)
+        out = self._acquire_tapes(1)
+        tapes = F.update_rewrite_stack(self.tapes, policies, new_vecs, self.max_depth,
+                                       self.summary_decay, out)
+        self._set_tapes(tapes, out)
         return self.tapes
 
     @classmethod
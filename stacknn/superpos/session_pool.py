@@ -0,0 +1,157 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Future
+import threading
+from typing import Deque, Dict, List, Optional, Tuple
+
+import torch
+
+from .base import AbstractStack
+
+
+class StackSessionPool:
+
+    """Serves many independent stack sessions out of one batched superposition stack.
+
+    Each session is admitted into a free slot, i.e. a row of the batch dimension of the underlying
+    stack's tapes. Callers submit one (policy, vector) request per step for their session, and every
+    call to tick() gathers the pending requests of all sessions into a single batched update.
+
+    Slots that have no request pending during a tick keep their previous contents. All slots share
+    the depth dimension of the batched tapes, so a newly admitted session sees a zero-filled tape
+    rather than an empty one.
+    """
+
+    def __init__(self,
+                 stack: AbstractStack,
+                 num_slots: int,
+                 device: Optional[int] = None):
+        self.stack = stack
+        self.num_slots = num_slots
+        self.device = device
+        self.stack.reset(num_slots, device=device)
+
+        self._free_slots: List[int] = list(range(num_slots))
+        self._active_slots = set()
+        self._pending: Dict[int, Deque[Tuple[torch.FloatTensor, torch.FloatTensor, Future]]] = {}
+
+        # The state lock guards the tapes and the slot tables; the pending lock only guards requests.
+        self._state_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def num_active(self) -> int:
+        return len(self._active_slots)
+
+    def admit(self) -> int:
+        """Reserve a free slot for a new session and return its index."""
+        with self._state_lock:
+            if not self._free_slots:
+                raise RuntimeError("No free slots in pool of size {}.".format(self.num_slots))
+            slot = self._free_slots.pop(0)
+            self._active_slots.add(slot)
+            return slot
+
+    def evict(self, slot: int) -> None:
+        """Release a slot, cancelling its pending requests and clearing its stack contents."""
+        with self._state_lock:
+            self._check_active(slot)
+            with self._pending_lock:
+                for _, _, future in self._pending.pop(slot, ()):
+                    future.cancel()
+            index = torch.tensor([slot], device=self.stack.tapes.device)
+            self.stack.tapes = self.stack.tapes.index_fill(0, index, 0.)
+            self._active_slots.remove(slot)
+            self._free_slots.append(slot)
+            self._free_slots.sort()
+
+    def submit(self,
+               slot: int,
+               policy: torch.FloatTensor,  # Distribution of shape [num_actions].
+               new_vec: torch.FloatTensor  # Vector of shape [stack_dim].
+              ) -> Future:
+        """Queue one update for a session. The future resolves to the session's [depth, stack_dim]
+        tape once a tick has applied the update."""
+        self._check_active(slot)
+        future = Future()
+        with self._pending_lock:
+            self._pending.setdefault(slot, deque()).append((policy, new_vec, future))
+        return future
+
+    async def asubmit(self,
+                      slot: int,
+                      policy: torch.FloatTensor,
+                      new_vec: torch.FloatTensor) -> torch.FloatTensor:
+        """Awaitable version of submit. Some thread must keep calling tick(), e.g. via start()."""
+        return await asyncio.wrap_future(self.submit(slot, policy, new_vec))
+
+    def tick(self) -> int:
+        """Apply at most one pending request per slot in a single batched update.
+
+        Returns the number of requests that were served.
+        """
+        with self._state_lock:
+            with self._pending_lock:
+                requests = {}
+                for slot, queue in list(self._pending.items()):
+                    requests[slot] = queue.popleft()
+                    if not queue:
+                        del self._pending[slot]
+
+            if not requests:
+                return 0
+
+            old_tapes = self.stack.tapes
+            num_actions = self.stack.get_num_actions()
+            device = old_tapes.device
+            policies = torch.zeros(self.num_slots, num_actions, device=device, dtype=old_tapes.dtype)
+            new_vecs = torch.zeros(self.num_slots, self.stack.stack_dim, device=device, dtype=old_tapes.dtype)
+            mask = torch.zeros(self.num_slots, dtype=torch.bool, device=device)
+            for slot, (policy, new_vec, _) in requests.items():
+                policies[slot] = policy
+                new_vecs[slot] = new_vec
+                mask[slot] = True
+
+            new_tapes = self.stack.update(policies, new_vecs)
+
+            # Idle slots keep their old contents, padded or truncated to the new depth.
+            depth = new_tapes.size(1)
+            if depth >= old_tapes.size(1):
+                kept_tapes = torch.nn.functional.pad(old_tapes, (0, 0, 0, depth - old_tapes.size(1)))
+            else:
+                kept_tapes = old_tapes[:, :depth]
+            self.stack.tapes = torch.where(mask.view(-1, 1, 1), new_tapes, kept_tapes)
+
+            for slot, (_, _, future) in requests.items():
+                if future.set_running_or_notify_cancel():
+                    future.set_result(self.stack.tapes[slot])
+            return len(requests)
+
+    def start(self, interval: float = 0.) -> None:
+        """Call tick() in a background thread until stop() is called."""
+        if self._thread is not None:
+            raise RuntimeError("Pool is already running.")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._serve, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _serve(self, interval: float) -> None:
+        while not self._stop_event.is_set():
+            if self.tick() == 0:
+                self._stop_event.wait(interval or 1e-3)
+            elif interval:
+                self._stop_event.wait(interval)
+
+    def _check_active(self, slot: int) -> None:
+        if slot not in self._active_slots:
+            raise KeyError("Slot {} is not active.".format(slot))
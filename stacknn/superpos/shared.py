@@ -0,0 +1,72 @@
+import torch
+
+from .base import AbstractStack
+
+
+class SharedTapes:
+
+    """Batched superposition stack state stored in shared memory.
+
+    The tapes of all slots live in one preallocated [num_slots, max_depth, stack_dim] tensor that is
+    moved to shared memory, so that it can be passed to torch.multiprocessing workers without
+    copying. A worker attaches a contiguous slice of slots to its own AbstractStack, updates it, and
+    commits the result back. Different workers may operate on disjoint slices concurrently.
+
+    Each slot keeps track of its own depth. Slices are zero-padded at the bottom up to the deepest
+    slot in the slice.
+    """
+
+    def __init__(self,
+                 num_slots: int,
+                 stack_dim: int,
+                 max_depth: int,
+                 dtype: torch.dtype = torch.float32):
+        self.num_slots = num_slots
+        self.stack_dim = stack_dim
+        self.max_depth = max_depth
+        self.tapes = torch.zeros(num_slots, max_depth, stack_dim, dtype=dtype).share_memory_()
+        self.depths = torch.zeros(num_slots, dtype=torch.long).share_memory_()
+
+    def view(self, slots: slice) -> torch.FloatTensor:
+        """Return a zero-copy [len(slots), depth, stack_dim] view of the tapes in a slice of slots."""
+        depths = self.depths[slots]
+        depth = int(depths.max()) if depths.numel() > 0 else 0
+        return self.tapes[slots, :depth]
+
+    def attach(self, stack: AbstractStack, slots: slice) -> None:
+        """Point the tapes of stack at the shared state of a slice of slots."""
+        if stack.max_depth is None or stack.max_depth > self.max_depth:
+            raise ValueError("Stack max_depth must be set and at most {}.".format(self.max_depth))
+        stack.tapes = self.view(slots)
+
+    def commit(self, stack: AbstractStack, slots: slice) -> None:
+        """Write the tapes of stack back into a slice of slots."""
+        tapes = stack.tapes.detach()
+        depth = tapes.size(1)
+        if depth > self.max_depth:
+            raise ValueError("Tapes of depth {} do not fit in shared state.".format(depth))
+        self.tapes[slots, :depth] = tapes
+        self.tapes[slots, depth:] = 0.
+        self.depths[slots] = depth
+
+    def update(self,
+               stack: AbstractStack,
+               slots: slice,
+               policies: torch.FloatTensor,  # Distribution of shape [len(slots), num_actions].
+               new_vecs: torch.FloatTensor   # Vectors of shape [len(slots), stack_dim].
+              ) -> torch.FloatTensor:
+        """Attach, update and commit a slice of slots in one call."""
+        self.attach(stack, slots)
+        stack.update(policies, new_vecs)
+        self.commit(stack, slots)
+        return self.view(slots)
+
+    def move(self, src: int, dst: int) -> None:
+        """Move the session in slot src to slot dst, clearing src."""
+        self.tapes[dst] = self.tapes[src]
+        self.depths[dst] = self.depths[src]
+        self.clear(src)
+
+    def clear(self, slot: int) -> None:
+        self.tapes[slot] = 0.
+        self.depths[slot] = 0
@@ -1,8 +1,8 @@
-from overrides import overrides
 import torch
 from typing import Optional
 
-from .base import AbstractStack
+from stacknn.utils.instrumentation import instrumented
+from .base import AbstractStack, overrides
 from . import functional as F
 
 
@@ -16,12 +16,16 @@ class Stack(AbstractStack):
     step. In other words, it does not allow no-operation as an option.
     """
 
+    @instrumented
     @overrides
     def update(self,
                policies: torch.FloatTensor,  # Distribution of shape [batch_size, 2].
                new_vecs: torch.FloatTensor   # Vectors of shape [batch_size, stack_dim].
               ) -> torch.FloatTensor:
-        self.tapes = F.update_stack(self.tapes, policies, new_vecs, self.max_depth)
+        out = self._acquire_tapes(1)
+        tapes = F.update_stack(self.tapes, policies, new_vecs, self.max_depth,
+                               self.summary_decay, out)
+        self._set_tapes(tapes, out)
         return self.tapes
 
     @classmethod
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+
+from stacknn.benchmarks.__main__ import main
+from stacknn.benchmarks.microbench import QUICK, Case, compare, get_cases, run_case
+from stacknn.benchmarks.workloads import dyck_batches, reversal_batches, run_workload
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_cases_cover_variants(self):
+        names = {case.name for case in get_cases(QUICK)}
+        assert "Stack" in names and "MultiPopStack" in names and "Deque" in names
+        assert {"structs.Stack", "structs.Queue", "structs.NullStruct"} <= names
+
+    def test_run_case(self):
+        for name in ["MultiPopStack", "structs.Queue"]:
+            case = Case(name, 2, 3, 4, 3, 4 if name == "MultiPopStack" else None, True)
+            result = run_case(case, min_time=0.)
+            assert result["steps_per_sec"] > 0
+            assert result["allocations"] > 0
+
+    def test_compare(self):
+        baseline = {"a": {"steps_per_sec": 100.}, "b": {"steps_per_sec": 100.}}
+        results = {"a": {"steps_per_sec": 95.}, "b": {"steps_per_sec": 80.}, "c": {"steps_per_sec": 1.}}
+        assert compare(results, baseline, threshold=.1) == ["b"]
+
+    def test_main_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "results.json")
+            args = ["--filter", "structs.NullStruct/b=1/", "--min-time", "0", "--no-profile"]
+            assert main(args + ["--output", output]) == 0
+
+            with open(output) as fh:
+                baseline = json.load(fh)
+            assert len(baseline) == 2
+            for result in baseline.values():
+                result["steps_per_sec"] *= 1e6
+            with open(output, "w") as fh:
+                json.dump(baseline, fh)
+            assert main(args + ["--baseline", output, "--output", os.devnull]) == 1
+
+
+class TestWorkloads(unittest.TestCase):
+
+    def test_dyck(self):
+        inputs, targets = next(dyck_batches(8, 12, num_types=3))
+        for tokens, expected in zip(inputs.tolist(), targets.tolist()):
+            stack = []
+            for token, target in zip(tokens, expected):
+                if token % 2 == 0:
+                    stack.append(token // 2)
+                else:
+                    assert stack.pop() == token // 2
+                assert target == (stack[-1] if stack else 3)
+            assert not stack
+
+    def test_reversal(self):
+        inputs, targets = next(reversal_batches(2, 3))
+        assert inputs.shape == targets.shape == (2, 7)
+        assert (inputs[:, 3] == 1).all()
+        assert targets[:, 4:].tolist() == inputs[:, :3].flip(1).tolist()
+
+    def test_run_workload(self):
+        for stack in ["MultiPopStack", "Deque", "structs.Stack"]:
+            result = run_workload("dyck", stack, steps=2, batch_size=2, length=4)
+            assert result["tokens_per_sec"] > 0
+
+
+if __name__ == "__main__":
+    unittest.main()
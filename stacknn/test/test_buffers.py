@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+import torch
+
+from stacknn.structs import OutputBuffer, PointerInputBuffer, Queue
+
+
+class TestPointerInputBuffer(unittest.TestCase):
+
+    def test_matches_queue(self):
+        inputs = torch.randn(3, 5, 4)
+        buffer = PointerInputBuffer(inputs)
+        queue = Queue(3, 4)
+        for t in range(5):
+            queue.push(inputs[:, t], torch.ones(3, 1))
+
+        for _ in range(6):
+            u = torch.rand(3, 1)
+            queue.pop(u)
+            expected = queue.read(torch.ones(3, 1))
+            torch.testing.assert_close(buffer(u), expected)
+
+    def test_read_overlap(self):
+        inputs = torch.tensor([[[1.], [2.], [3.]]])
+        buffer = PointerInputBuffer(inputs)
+        # With a pointer of 1.25, the read window covers .75 of item 1 and .25 of item 2.
+        buffer.pop(1.)
+        buffer.pop(torch.tensor([.25]))
+        torch.testing.assert_close(buffer.read(1.), torch.tensor([[.75 * 2. + .25 * 3.]]))
+
+    def test_exhausted(self):
+        buffer = PointerInputBuffer(torch.ones(2, 2, 3))
+        output = buffer(3.)
+        assert output.tolist() == [[0., 0., 0.], [0., 0., 0.]]
+
+    def test_gradient(self):
+        inputs = torch.randn(2, 4, 3, requires_grad=True)
+        u = torch.full((2,), .5, requires_grad=True)
+        buffer = PointerInputBuffer(inputs)
+        buffer(u).sum().backward()
+        assert inputs.grad is not None and u.grad is not None
+
+    def test_push(self):
+        buffer = PointerInputBuffer(torch.ones(1, 2, 3))
+        with self.assertRaises(NotImplementedError):
+            buffer.push(torch.ones(1, 3), 1.)
+
+
+class TestOutputBuffer(unittest.TestCase):
+
+    def test_list_mode(self):
+        buffer = OutputBuffer(2, 3)
+        buffer(torch.ones(2, 3), torch.ones(2, 1))
+        assert len(buffer) == 1
+        assert len(buffer._values) == 1
+
+    def test_preallocated(self):
+        buffer = OutputBuffer(2, 3, max_length=4)
+        values = torch.randn(3, 2, 3)
+        for t in range(3):
+            buffer(values[t], torch.full((2, 1), t / 2.))
+        assert len(buffer) == 3
+        assert buffer.outputs.data_ptr() == buffer._outputs.data_ptr()
+        torch.testing.assert_close(buffer.outputs, values.transpose(0, 1))
+        expected = values.transpose(0, 1) * torch.tensor([0., .5, 1.]).view(1, 3, 1)
+        torch.testing.assert_close(buffer.collapse(), expected)
+
+    def test_full(self):
+        buffer = OutputBuffer(1, 2, max_length=1)
+        buffer(torch.ones(1, 2), 1.)
+        with self.assertRaises(ValueError):
+            buffer(torch.ones(1, 2), 1.)
+
+    def test_gradient(self):
+        buffer = OutputBuffer(1, 2, max_length=2)
+        value = torch.ones(1, 2, requires_grad=True)
+        buffer(value, 1.)
+        buffer(2 * value, .5)
+        buffer.collapse().sum().backward()
+        torch.testing.assert_close(value.grad, torch.full((1, 2), 2.))
+
+    def test_preallocated_read(self):
+        buffer = OutputBuffer(2, 3, max_length=4)
+        queue = Queue(2, 3)
+        for _ in range(3):
+            value, strength = torch.randn(2, 3), torch.rand(2, 1)
+            buffer(value, strength)
+            queue.push(value, strength)
+        strength = torch.full((2, 1), .7)
+        torch.testing.assert_close(buffer.read(strength), queue.read(strength))
+        with self.assertRaises(NotImplementedError):
+            buffer.pop(strength)
+
+    def test_preallocated_state(self):
+        buffer = OutputBuffer(2, 3, max_length=4)
+        buffer(torch.randn(2, 3), torch.ones(2, 1))
+        buffer(torch.randn(2, 3), torch.full((2, 1), .5))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.pt")
+            buffer.save_state(path)
+            restored = OutputBuffer(2, 3, max_length=4)
+            restored.load_state(path, mmap=False)
+        self.assertEqual(len(restored), 2)
+        torch.testing.assert_close(restored.outputs, buffer.outputs)
+        torch.testing.assert_close(restored.output_strengths, buffer.output_strengths)
+
+    def test_preallocated_detach(self):
+        buffer = OutputBuffer(1, 2, max_length=2)
+        buffer(torch.ones(1, 2, requires_grad=True), torch.ones(1, 1, requires_grad=True))
+        buffer.detach()
+        self.assertFalse(buffer.outputs.requires_grad)
+        self.assertFalse(buffer.output_strengths.requires_grad)
+        buffer(torch.ones(1, 2), 1.)
+        self.assertFalse(buffer.collapse().requires_grad)
+
+
+if __name__ == "__main__":
+    unittest.main()
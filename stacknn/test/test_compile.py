@@ -0,0 +1,83 @@
+import unittest
+import torch
+
+import stacknn.structs.functional as SF
+import stacknn.superpos.functional as F
+
+
+# Each update function with the number of actions it takes and any extra positional arguments.
+UPDATES = [
+    (F.update_stack, 2, ()),
+    (F.update_noop_stack, 3, ()),
+    (F.update_rewrite_stack, 3, ()),
+    (F.update_minimalist_stack, 2, ()),
+    (F.update_transition_parser_stack, 3, ()),
+    (F.update_kpop_stack, 4, (4,)),
+    (F.update_kpush_stack, 4, (4,)),
+]
+
+
+def _run_weighted(values, strengths, inputs):
+    reads = []
+    for value, pop, push in inputs:
+        strengths = SF.pop_stack(strengths, pop)
+        values, strengths = SF.push(values, strengths, value, push)
+        reads.append(SF.read_stack(values, strengths, torch.ones_like(pop)))
+    return torch.stack(reads)
+
+
+def _reference_kpop(tapes, policies, new_vecs, num_actions):
+    """The original per-action loop of update_kpop_stack, which drops the bottom k rows."""
+    batch_size, length, stack_dim = tapes.size()
+    new_tapes = torch.zeros(batch_size, num_actions, length + 1, stack_dim)
+    for action in range(num_actions):
+        new_tapes[:, action, 0] = new_vecs
+        if action <= length:
+            new_tapes[:, action, 1:1 + length - action] = tapes[:, :length - action]
+    return torch.sum(policies.unsqueeze(-1).unsqueeze(-1) * new_tapes, dim=1)
+
+
+class TestCompile(unittest.TestCase):
+
+    def test_kpop_matches_reference(self):
+        torch.manual_seed(0)
+        for length in [0, 1, 3, 7]:
+            tapes = torch.randn(2, length, 3)
+            policies = torch.softmax(torch.randn(2, 5), -1)
+            new_vecs = torch.randn(2, 3)
+            torch.testing.assert_close(F.update_kpop_stack(tapes, policies, new_vecs, 5),
+                                       _reference_kpop(tapes, policies, new_vecs, 5))
+
+    def _check_update(self, update, compiled_update, num_actions, extra):
+        tapes = torch.zeros(2, 0, 3)
+        for _ in range(4):
+            policies = torch.softmax(torch.randn(2, num_actions), dim=-1)
+            new_vecs = torch.randn(2, 3)
+            expected = update(tapes, policies, new_vecs, *extra, 3, .5)
+            actual = compiled_update(tapes, policies, new_vecs, *extra, 3, .5)
+            torch.testing.assert_close(actual, expected)
+            tapes = expected
+
+    def test_script_superpos(self):
+        for update, num_actions, extra in UPDATES:
+            self._check_update(update, torch.jit.script(update), num_actions, extra)
+
+    def test_compile_superpos(self):
+        for update, num_actions, extra in UPDATES:
+            compiled = torch.compile(update, backend="eager", fullgraph=True, dynamic=True)
+            self._check_update(update, compiled, num_actions, extra)
+
+    def test_script_weighted(self):
+        for function in [SF.push, SF.pop_stack, SF.read_stack, SF.pop_queue, SF.read_queue]:
+            torch.jit.script(function)
+
+    def test_compile_weighted(self):
+        inputs = [(torch.randn(2, 3), torch.rand(2), torch.rand(2)) for _ in range(4)]
+        values, strengths = torch.zeros(2, 0, 3), torch.zeros(2, 0)
+        compiled = torch.compile(_run_weighted, backend="eager", fullgraph=True)
+        torch.testing.assert_close(compiled(values, strengths, inputs),
+                                   _run_weighted(values, strengths, inputs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+import torch
+
+from stacknn.benchmarks.workloads import TASKS
+from stacknn.examples.ddp import launch, local_loss, make_model
+from stacknn.structs import ShardedStruct, Stack as WeightedStack, VectorizedStack
+from stacknn.superpos import Stack, StackModule
+
+
+class TestStackModule(unittest.TestCase):
+
+    def test_tapes_not_state(self):
+        module = StackModule(Stack(3))
+        module(torch.tensor([[1., 0.], [1., 0.]]), torch.randn(2, 3))
+        self.assertEqual(module.tapes.shape, (2, 1, 3))
+        self.assertEqual(list(module.state_dict()), [])
+        self.assertEqual(list(module.buffers()), [])
+
+        module.reset(3)
+        module(torch.tensor([[1., 0.]] * 3), torch.randn(3, 3))
+        self.assertEqual(module.tapes.shape, (3, 1, 3))
+
+    def test_model_state_dict(self):
+        model = make_model("dyck")
+        self.assertFalse(any(name.startswith("stack.") for name in model.state_dict()))
+        self.assertEqual(model(torch.randint(4, (2, 5))).shape, (2, 5, 3))
+
+    def test_uneven_split_gradient(self):
+        """Averaging the gradients of uneven shares gives the gradient of the global batch."""
+        torch.manual_seed(0)
+        model = make_model("dyck")
+        inputs, targets = next(TASKS["dyck"].batches(5, 4))
+        targets[0, :2] = -100
+        num_targets = int((targets != -100).sum())
+
+        model.zero_grad()
+        logits = model(inputs)
+        torch.nn.functional.cross_entropy(logits.flatten(0, 1), targets.flatten(),
+                                          ignore_index=-100).backward()
+        expected = [param.grad.clone() for param in model.parameters()]
+
+        model.zero_grad()
+        for share_inputs, share_targets in zip(inputs.tensor_split(2), targets.tensor_split(2)):
+            # DDP divides the sum of the gradients of the processes by world_size.
+            (local_loss(model(share_inputs), share_targets, num_targets, 2) / 2).backward()
+        for param, grad in zip(model.parameters(), expected):
+            torch.testing.assert_close(param.grad, grad)
+
+
+class TestStructReset(unittest.TestCase):
+
+    def test_reset(self):
+        for struct in [WeightedStack(2, 3), VectorizedStack(2, 3), ShardedStruct(WeightedStack, 2, 3)]:
+            struct(torch.randn(2, 3), torch.zeros(2, 1), torch.ones(2, 1))
+            struct.reset(4)
+            self.assertEqual(len(struct), 0)
+            self.assertEqual(struct.batch_size, 4)
+            read = struct(torch.randn(4, 3), torch.zeros(4, 1), torch.ones(4, 1))
+            self.assertEqual(read.shape, (4, 3))
+
+
+class TestDistributed(unittest.TestCase):
+
+    def test_launch(self):
+        for stack_name in ["Stack", "structs.Stack"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                # A global batch of 5 gives the processes batches of 3 and 2.
+                launch(2, stack_name=stack_name, steps=2, batch_size=5, length=4, num_threads=1,
+                       output_dir=tmp)
+                params = [torch.load(os.path.join(tmp, "rank{}.pt".format(rank))) for rank in range(2)]
+            torch.manual_seed(0)
+            initial = make_model("dyck", stack_name).state_dict()
+            for name, value in params[0].items():
+                torch.testing.assert_close(params[1][name], value)
+            self.assertFalse(torch.equal(params[0]["output.weight"], initial["output.weight"]))
@@ -0,0 +1,60 @@
+import unittest
+import torch
+
+from numpy.testing import assert_approx_equal
+
+from stacknn.structs import Stack as WeightedStack, Queue
+from stacknn.structs.null import NullStruct
+from stacknn.superpos import Stack, NoOpStack, MultiPopStack, MultiPushStack, MinimalistStack, \
+    RewriteStack, TransitionParserStack
+
+
+SUPERPOS_STACKS = [Stack, NoOpStack, MultiPopStack, MultiPushStack, MinimalistStack, RewriteStack,
+                   TransitionParserStack]
+
+
+class TestDtype(unittest.TestCase):
+
+    def test_superpos_bfloat16(self):
+        for stack_type in SUPERPOS_STACKS:
+            stack = stack_type.empty(2, 4, dtype=torch.bfloat16)
+            num_actions = stack.get_num_actions()
+            policies = torch.softmax(torch.randn(2, num_actions), dim=-1)
+            for _ in range(3):
+                stack.update(policies, torch.randn(2, 4))
+                assert stack.tapes.dtype == torch.bfloat16, stack_type.__name__
+
+    def test_superpos_matches_float32(self):
+        stack = Stack.empty(1, 2, dtype=torch.bfloat16)
+        reference = Stack.empty(1, 2)
+        policies = torch.tensor([[.75, .25]])
+        for _ in range(4):
+            vecs = torch.tensor([[.5, -.25]])
+            stack.update(policies, vecs)
+            reference.update(policies, vecs)
+        torch.testing.assert_close(stack.tapes.float(), reference.tapes, atol=1e-2, rtol=1e-2)
+
+    def test_weighted_bfloat16(self):
+        for struct_type, expected in [(WeightedStack, 2.8), (Queue, 2.7)]:
+            struct = struct_type(1, 1, dtype=torch.bfloat16)
+            inputs = [([[1.]], [[0.]], [[.8]]), ([[2.]], [[.1]], [[.5]]), ([[3.]], [[.9]], [[.9]])]
+            for values, pops, pushes in inputs:
+                out = struct(torch.tensor(values), torch.tensor(pops), torch.tensor(pushes))
+            assert out.dtype == torch.bfloat16
+            assert all(value.dtype == torch.bfloat16 for value in struct._values)
+            assert all(strength.dtype == torch.float32 for strength in struct._strengths)
+            assert_approx_equal(out.item(), expected, significant=2)
+
+    def test_half_strengths_promoted(self):
+        stack = WeightedStack(1, 1)
+        stack.push(torch.ones(1, 1), torch.full([1, 1], .1, dtype=torch.float16))
+        assert stack._strengths[0].dtype == torch.float32
+
+    def test_null_struct(self):
+        struct = NullStruct(2, 3, dtype=torch.bfloat16)
+        out = struct(torch.zeros(2, 3), torch.zeros(2, 1), torch.zeros(2, 1))
+        assert out.dtype == torch.bfloat16
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+import unittest
+
+import stacknn
+from stacknn.superpos.base import AbstractStack, overrides
+
+
+def _loaded_modules(statement):
+    code = "import sys; {}; print(' '.join(sys.modules))".format(statement)
+    return set(subprocess.check_output([sys.executable, "-c", code]).decode().split())
+
+
+class TestImports(unittest.TestCase):
+
+    def test_lazy_superpos(self):
+        modules = _loaded_modules("import stacknn.superpos")
+        assert "stacknn.superpos" in modules
+        assert "stacknn.superpos.stack" not in modules
+        assert "stacknn.structs" not in modules
+        assert "overrides" not in modules and "numpy.testing" not in modules
+
+    def test_attribute_access(self):
+        assert stacknn.superpos.Stack.get_num_actions() == 2
+        assert stacknn.structs.Stack.__name__ == "Stack"
+        assert "Deque" in dir(stacknn.superpos)
+        with self.assertRaises(AttributeError):
+            stacknn.superpos.Missing
+
+    def test_overrides_checked(self):
+        with self.assertRaises(TypeError):
+            class BadStack(AbstractStack):
+                @overrides
+                def upgrade(self):
+                    pass
+
+
+if __name__ == "__main__":
+    unittest.main()
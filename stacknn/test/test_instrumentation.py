@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+import torch
+from torch.profiler import ProfilerActivity, profile
+
+from stacknn.structs import Stack as WeightedStack
+from stacknn.superpos import Stack
+from stacknn.utils.instrumentation import add_hook, collect
+
+
+PUSH = torch.tensor([[1., 0.]])
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_disabled(self):
+        stack = Stack.empty(1, 3)
+        stack.update(PUSH, torch.ones(1, 3))
+        assert "_instrumentation_hooks" not in stack.__dict__
+
+        struct = WeightedStack(1, 2)
+        struct(torch.ones(1, 2), torch.zeros(1, 1), torch.ones(1, 1))
+        struct.pop(torch.full((1, 1), .5))
+        struct.read(torch.ones(1, 1))
+        assert "_cascade" not in struct.__dict__
+
+    def test_global_hook(self):
+        stack = Stack.empty(1, 3)
+        with collect() as collector:
+            stack.update(PUSH, torch.ones(1, 3))
+            stack.update(PUSH, torch.ones(1, 3))
+        stack.update(PUSH, torch.ones(1, 3))
+        assert [event.depth for event in collector.events] == [1, 2]
+        assert collector.summary()["Stack.update"]["calls"] == 2
+
+    def test_instance_hook(self):
+        stack, other = Stack.empty(1, 3), Stack.empty(1, 3)
+        events = []
+        handle = add_hook(events.append, stack)
+        stack.update(PUSH, torch.ones(1, 3))
+        other.update(PUSH, torch.ones(1, 3))
+        handle.remove()
+        stack.update(PUSH, torch.ones(1, 3))
+        assert len(events) == 1
+
+    def test_cascade(self):
+        stack = WeightedStack(1, 2)
+        for _ in range(4):
+            stack.push(torch.ones(1, 2), torch.ones(1, 1))
+        with collect(stack) as collector:
+            stack.pop(torch.full((1, 1), .5))
+            stack.read(torch.full((1, 1), 2.5))
+        pop, read = collector.events
+        assert (pop.cascade_iterations, pop.early_exit) == (1, True)
+        assert (read.cascade_iterations, read.early_exit) == (3, True)
+        assert collector.summary()["SimpleStruct.read"]["early_exit_rate"] == 1.
+
+    def test_bytes_allocated(self):
+        stack = Stack.empty(2, 3)
+        with collect() as collector:
+            stack.update(PUSH.expand(2, 2), torch.ones(2, 3))
+            stack.update(PUSH.expand(2, 2), torch.ones(2, 3))
+        # The new tapes of each update hold 2 x depth x 3 float32s.
+        for event in collector.events:
+            assert event.bytes_allocated >= 2 * event.depth * 3 * 4
+        assert collector.summary()["Stack.update"]["bytes_allocated"] > 0
+
+    def test_chrome_trace(self):
+        stack = WeightedStack(1, 2)
+        with collect() as collector:
+            stack(torch.ones(1, 2), torch.zeros(1, 1), torch.ones(1, 1))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            collector.export_chrome_trace(path)
+            with open(path) as fh:
+                trace = json.load(fh)
+        # The fused forward pushes through the instrumented push, which finishes first.
+        names = [event["name"] for event in trace["traceEvents"]]
+        assert names == ["SimpleStruct.push", "SimpleStruct.forward"]
+        assert trace["traceEvents"][1]["args"]["cascade_iterations"] == 0
+
+    def test_record_function(self):
+        stack = Stack.empty(1, 3)
+        with profile(activities=[ProfilerActivity.CPU]) as prof:
+            stack.update(PUSH, torch.ones(1, 3))
+        assert "Stack.update" in {event.name for event in prof.events()}
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import torch
+
+from stacknn.superpos import Stack, MultiPushStack
+from stacknn.superpos.functional.base import enforce_max_depth
+
+
+PUSH = torch.tensor([[1., 0.]])
+POP = torch.tensor([[0., 1.]])
+
+
+class TestMaxDepth(unittest.TestCase):
+
+    def test_truncate(self):
+        tapes = torch.arange(4.).view(1, 4, 1)
+        assert enforce_max_depth(tapes, 2).tolist() == [[[0.], [1.]]]
+        assert enforce_max_depth(tapes).tolist() == tapes.tolist()
+
+    def test_summary_sum(self):
+        tapes = torch.arange(4.).view(1, 4, 1)
+        assert enforce_max_depth(tapes, 2, 1.).tolist() == [[[0.], [6.]]]
+
+    def test_summary_decay(self):
+        tapes = torch.arange(4.).view(1, 4, 1)
+        assert enforce_max_depth(tapes, 2, .5).tolist() == [[[0.], [3.5]]]
+
+    def test_stack_summary(self):
+        stack = Stack.empty(1, 1, max_depth=2, summary_decay=1.)
+        for value in [1., 2., 3.]:
+            stack.update(PUSH, torch.tensor([[value]]))
+        assert stack.tapes.tolist() == [[[3.], [3.]]]
+
+        # Popping brings the summary to the top.
+        stack.update(POP, torch.tensor([[0.]]))
+        assert stack.tapes.tolist() == [[[3.], [0.]]]
+
+    def test_stack_truncate(self):
+        stack = Stack.empty(1, 1, max_depth=2)
+        for value in [1., 2., 3.]:
+            stack.update(PUSH, torch.tensor([[value]]))
+        assert stack.tapes.tolist() == [[[3.], [2.]]]
+
+    def test_multipush_summary(self):
+        stack = MultiPushStack.empty(1, 1, max_depth=2, num_actions=3, summary_decay=1.)
+        stack.update(torch.tensor([[0., 0., 1.]]), torch.tensor([[1.]]))
+        stack.update(torch.tensor([[0., 0., 1.]]), torch.tensor([[2.]]))
+        assert stack.tapes.tolist() == [[[2.], [3.]]]
+
+
+if __name__ == "__main__":
+    unittest.main()
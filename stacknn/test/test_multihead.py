@@ -0,0 +1,59 @@
+import unittest
+import torch
+
+from stacknn.structs import VectorizedStack, VectorizedQueue
+from stacknn.superpos import Stack, NoOpStack, MultiPopStack, MultiPushStack, MinimalistStack, \
+    RewriteStack, TransitionParserStack
+
+
+SUPERPOS_STACKS = [Stack, NoOpStack, MultiPopStack, MultiPushStack, MinimalistStack, RewriteStack,
+                   TransitionParserStack]
+
+
+class TestMultiHead(unittest.TestCase):
+
+    def test_superpos_shape(self):
+        stack = Stack.empty(2, 5, num_heads=3)
+        assert stack.tapes.size() == (2, 3, 0, 5)
+        stack.update(torch.ones(2, 3, 2) / 2, torch.randn(2, 3, 5))
+        assert stack.tapes.size() == (2, 3, 1, 5)
+
+    def test_superpos_matches_separate_heads(self):
+        torch.manual_seed(0)
+        for stack_type in SUPERPOS_STACKS:
+            multihead = stack_type.empty(2, 5, max_depth=4, num_heads=3)
+            heads = [stack_type.empty(2, 5, max_depth=4) for _ in range(3)]
+            num_actions = multihead.get_num_actions()
+            for _ in range(6):
+                policies = torch.softmax(torch.randn(2, 3, num_actions), dim=-1)
+                new_vecs = torch.randn(2, 3, 5)
+                multihead.update(policies, new_vecs)
+                for head, stack in enumerate(heads):
+                    stack.update(policies[:, head], new_vecs[:, head])
+            for head, stack in enumerate(heads):
+                torch.testing.assert_close(multihead.tapes[:, head], stack.tapes, msg=stack_type.__name__)
+
+    def test_weighted_matches_separate_heads(self):
+        torch.manual_seed(0)
+        for struct_type in [VectorizedStack, VectorizedQueue]:
+            multihead = struct_type(2, 5, num_heads=3)
+            heads = [struct_type(2, 5) for _ in range(3)]
+            for _ in range(6):
+                values = torch.randn(2, 3, 5)
+                pops, pushes, reads = torch.rand(2, 3), torch.rand(2, 3), 2 * torch.rand(2, 3)
+                out = multihead(values, pops, pushes, reads)
+                assert out.size() == (2, 3, 5)
+                for head, struct in enumerate(heads):
+                    expected = struct(values[:, head], pops[:, head], pushes[:, head], reads[:, head])
+                    torch.testing.assert_close(out[:, head], expected)
+
+    def test_weighted_detach(self):
+        stack = VectorizedStack(1, 2, num_heads=2)
+        stack.push(torch.ones(1, 2, 2), torch.tensor([[1., 0.]]))
+        stack.push(torch.ones(1, 2, 2), torch.tensor([[0., 0.]]))
+        stack.detach()
+        assert stack.values.size() == (1, 2, 1, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
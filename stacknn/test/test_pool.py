@@ -0,0 +1,73 @@
+import unittest
+import torch
+
+from stacknn.superpos import MinimalistStack, NoOpStack, Stack
+from stacknn.superpos.functional import update_stack
+from stacknn.utils.pool import TensorPool
+
+
+class TestPool(unittest.TestCase):
+
+    def test_acquire_release(self):
+        pool = TensorPool(max_per_class=1)
+        tensor = pool.acquire((2, 3))
+        pool.release(tensor)
+        self.assertIs(pool.acquire((2, 3)), tensor)
+        pool.acquire((2, 4))
+        stats = pool.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_release_skips_views_and_grad(self):
+        pool = TensorPool()
+        pool.release(torch.zeros(4, 3)[:2])
+        pool.release(torch.zeros(2, 3, requires_grad=True))
+        self.assertEqual(pool.stats()["pooled"], 0)
+
+    def test_pooled_update(self):
+        for stack_type in [Stack, NoOpStack, MinimalistStack]:
+            pool = TensorPool()
+            pooled = stack_type.empty(2, 3, max_depth=2, pool=pool)
+            stack = stack_type.empty(2, 3, max_depth=2)
+            num_actions = stack.get_num_actions()
+            with torch.no_grad():
+                for _ in range(5):
+                    policies = torch.softmax(torch.randn(2, num_actions), -1)
+                    new_vecs = torch.randn(2, 3)
+                    torch.testing.assert_close(pooled.update(policies, new_vecs),
+                                               stack.update(policies, new_vecs))
+            self.assertGreater(pool.stats()["hits"], 0)
+
+    def test_unbounded_depth(self):
+        pool = TensorPool()
+        pooled = Stack.empty(2, 3, pool=pool)
+        stack = Stack.empty(2, 3)
+        with torch.no_grad():
+            for _ in range(300):
+                policies = torch.softmax(torch.randn(2, 2), -1)
+                new_vecs = torch.randn(2, 3)
+                pooled.update(policies, new_vecs)
+                stack.update(policies, new_vecs)
+        torch.testing.assert_close(pooled.tapes, stack.tapes)
+        # Depths are rounded up to powers of two, so each of the 10 size classes up to 512 rows
+        # misses at most twice, and the pool holds a small multiple of the live tapes.
+        stats = pool.stats()
+        self.assertLessEqual(stats["misses"], 20)
+        self.assertLessEqual(stats["pooled_bytes"], 8 * stack.tapes.nbytes)
+
+    def test_pool_unused_with_grad(self):
+        pool = TensorPool()
+        stack = Stack.empty(2, 3, pool=pool)
+        stack.update(torch.tensor([[1., 0.], [1., 0.]]), torch.randn(2, 3, requires_grad=True))
+        stack.tapes.sum().backward()
+        self.assertEqual(pool.stats()["misses"], 0)
+
+    def test_script_out(self):
+        scripted = torch.jit.script(update_stack)
+        tapes = torch.randn(2, 1, 3)
+        policies = torch.softmax(torch.randn(2, 2), -1)
+        new_vecs = torch.randn(2, 3)
+        out = torch.empty(2, 2, 3)
+        result = scripted(tapes, policies, new_vecs, None, None, out)
+        self.assertEqual(result.data_ptr(), out.data_ptr())
+        torch.testing.assert_close(result, update_stack(tapes, policies, new_vecs))
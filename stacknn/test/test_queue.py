@@ -0,0 +1,134 @@
+import unittest
+import torch
+
+from stacknn.superpos import Deque, Queue
+import stacknn.superpos.functional as F
+
+
+ENQUEUE = torch.tensor([[1., 0.]])
+DEQUEUE = torch.tensor([[0., 1.]])
+
+PUSH_FRONT = torch.tensor([[1., 0., 0., 0.]])
+POP_FRONT = torch.tensor([[0., 1., 0., 0.]])
+PUSH_BACK = torch.tensor([[0., 0., 1., 0.]])
+POP_BACK = torch.tensor([[0., 0., 0., 1.]])
+
+
+def _vec(value):
+    return torch.tensor([[value, 0.]])
+
+
+def _items(queue):
+    """The first entries of the occupied rows, front first."""
+    rows = queue.tapes[0, :, 0][queue.occupancy[0] > 0]
+    return rows.tolist()
+
+
+class TestQueue(unittest.TestCase):
+
+    def test_initialize(self):
+        queue = Queue.empty(1, 2)
+        assert queue.tapes.tolist() == [[]]
+        assert queue.occupancy.tolist() == [[]]
+
+    def test_first_in_first_out(self):
+        queue = Queue.empty(1, 2)
+        queue.update(ENQUEUE, _vec(1.))
+        queue.update(ENQUEUE, _vec(2.))
+        queue.update(ENQUEUE, _vec(3.))
+        assert _items(queue) == [1., 2., 3.]
+        queue.update(DEQUEUE, _vec(0.))
+        assert queue.tapes[0, 0].tolist() == [2., 0.]
+        assert _items(queue) == [2., 3.]
+
+    def test_no_gaps(self):
+        # Padding from a dequeue must not separate the front from later items.
+        queue = Queue.empty(1, 2)
+        queue.update(ENQUEUE, _vec(1.))
+        queue.update(ENQUEUE, _vec(2.))
+        queue.update(DEQUEUE, _vec(0.))
+        queue.update(DEQUEUE, _vec(0.))
+        queue.update(ENQUEUE, _vec(3.))
+        queue.update(ENQUEUE, _vec(4.))
+        assert queue.tapes[0, :2, 0].tolist() == [3., 4.]
+        assert queue.occupancy[0].tolist() == [1., 1., 0., 0., 0., 0.]
+
+    def test_dequeue_empty(self):
+        queue = Queue.empty(1, 2)
+        queue.update(DEQUEUE, _vec(1.))
+        assert queue.tapes.tolist() == [[[0., 0.]]]
+        assert queue.occupancy.tolist() == [[0.]]
+
+    def test_superpos(self):
+        queue = Queue.empty(1, 2)
+        queue.update(ENQUEUE, _vec(1.))
+        queue.update(torch.tensor([[.5, .5]]), _vec(2.))
+        torch.testing.assert_close(queue.tapes[0, :, 0], torch.tensor([.5, 1.]))
+        torch.testing.assert_close(queue.occupancy[0], torch.tensor([.5, .5]))
+
+    def test_max_depth(self):
+        queue = Queue.empty(1, 2, max_depth=2)
+        for value in [1., 2., 3.]:
+            queue.update(ENQUEUE, _vec(value))
+        assert queue.tapes[0, :, 0].tolist() == [1., 2.]
+        assert queue.occupancy.tolist() == [[1., 1.]]
+
+    def test_get_num_actions(self):
+        assert Queue.get_num_actions() == 2
+
+
+class TestDeque(unittest.TestCase):
+
+    def test_both_ends(self):
+        deque = Deque.empty(1, 2)
+        deque.update(PUSH_BACK, _vec(1.))
+        deque.update(PUSH_FRONT, _vec(2.))
+        deque.update(PUSH_BACK, _vec(3.))
+        assert _items(deque) == [2., 1., 3.]
+        deque.update(POP_BACK, _vec(0.))
+        assert _items(deque) == [2., 1.]
+        deque.update(POP_FRONT, _vec(0.))
+        assert _items(deque) == [1.]
+        deque.update(PUSH_BACK, _vec(4.))
+        assert _items(deque) == [1., 4.]
+
+    def test_pop_back_empty(self):
+        deque = Deque.empty(1, 2)
+        deque.update(POP_BACK, _vec(1.))
+        assert deque.tapes.tolist() == [[[0., 0.]]]
+        assert deque.occupancy.tolist() == [[0.]]
+
+    def test_occupancy_non_increasing(self):
+        deque = Deque.empty(3, 2)
+        for _ in range(6):
+            deque.update(torch.softmax(torch.randn(3, 4), dim=-1), torch.randn(3, 2))
+            differences = deque.occupancy[:, 1:] - deque.occupancy[:, :-1]
+            assert (differences <= 1e-6).all()
+
+    def test_get_num_actions(self):
+        assert Deque.get_num_actions() == 4
+
+
+class TestQueueFunctional(unittest.TestCase):
+
+    def _check(self, update, num_actions):
+        scripted = torch.jit.script(update)
+        tapes, occupancy = torch.zeros(2, 3, 0, 4), torch.zeros(2, 3, 0)
+        for _ in range(4):
+            policies = torch.softmax(torch.randn(2, 3, num_actions), dim=-1)
+            new_vecs = torch.randn(2, 3, 4)
+            expected = update(tapes, occupancy, policies, new_vecs, 3, .5)
+            torch.testing.assert_close(scripted(tapes, occupancy, policies, new_vecs, 3, .5), expected)
+            tapes, occupancy = expected
+        assert tapes.shape == (2, 3, 3, 4)
+        assert occupancy.shape == (2, 3, 3)
+
+    def test_script_queue(self):
+        self._check(F.update_queue, 2)
+
+    def test_script_deque(self):
+        self._check(F.update_deque, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+import numpy
+import torch
+
+from stacknn.structs import Stack as WeightedStack, VectorizedQueue
+from stacknn.superpos import Stack
+from stacknn.utils.recorder import TrajectoryRecorder
+
+
+class TestTrajectoryRecorder(unittest.TestCase):
+
+    def test_superpos(self):
+        stack = Stack.empty(2, 3)
+        recorder = TrajectoryRecorder(capacity=4).attach(stack)
+        policies = torch.tensor([[1., 0.], [0., 1.]])
+        stack.update(policies, torch.ones(2, 3))
+        stack.update(policies, torch.ones(2, 3))
+
+        records = recorder.records()
+        assert records["policies"].shape == (2, 2, 2)
+        assert records["depth"].tolist() == [[1, 0], [2, 0]]
+        torch.testing.assert_close(records["top_norm"][1], torch.tensor([3 ** .5, 0.]))
+
+    def test_ring_buffer(self):
+        stack = Stack.empty(1, 1)
+        recorder = TrajectoryRecorder(capacity=3).attach(stack)
+        for step in range(5):
+            stack.update(torch.tensor([[step / 4, 1 - step / 4]]), torch.ones(1, 1))
+        records = recorder.records()
+        torch.testing.assert_close(records["policies"][:, 0, 0], torch.tensor([.5, .75, 1.]))
+
+        recorder.detach()
+        stack.update(torch.tensor([[1., 0.]]), torch.ones(1, 1))
+        assert recorder.num_steps == 5
+
+    def test_structs(self):
+        for struct in [WeightedStack(2, 3), VectorizedQueue(2, 3)]:
+            recorder = TrajectoryRecorder(capacity=8).attach(struct)
+            struct(torch.ones(2, 3), torch.zeros(2, 1), torch.full((2, 1), .5))
+            struct(torch.ones(2, 3), torch.full((2, 1), .25), torch.ones(2, 1), torch.ones(2, 1))
+            records = recorder.records()
+            torch.testing.assert_close(records["push_strengths"][:, 0], torch.tensor([.5, 1.]))
+            torch.testing.assert_close(records["depth"][:, 0], torch.tensor([.5, 1.25]))
+
+    def test_save(self):
+        stack = Stack.empty(2, 3)
+        recorder = TrajectoryRecorder(capacity=4).attach(stack)
+        stack.update(torch.tensor([[1., 0.], [0., 1.]]), torch.ones(2, 3))
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder.save(os.path.join(tmp, "records.pt"))
+            records = torch.load(os.path.join(tmp, "records.pt"))
+            assert records["policies"].shape == (1, 2, 2)
+
+            recorder.save(os.path.join(tmp, "records"))
+            depth = numpy.load(os.path.join(tmp, "records", "depth.npy"), mmap_mode="r")
+            assert depth.tolist() == [[1, 0]]
+
+    def test_save_bfloat16(self):
+        stack = Stack.empty(1, 3, dtype=torch.bfloat16)
+        recorder = TrajectoryRecorder(capacity=4).attach(stack)
+        policies = torch.tensor([[1., 0.]], dtype=torch.bfloat16)
+        stack.update(policies, torch.ones(1, 3, dtype=torch.bfloat16))
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder.save(os.path.join(tmp, "records"))
+            saved = numpy.load(os.path.join(tmp, "records", "policies.npy"))
+        assert saved.dtype == numpy.float32
+        assert saved.tolist() == [[[1., 0.]]]
+
+
+if __name__ == "__main__":
+    unittest.main()
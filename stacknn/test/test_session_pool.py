@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+import torch
+
+from stacknn.superpos import Stack, StackSessionPool
+
+
+PUSH = torch.tensor([1., 0.])
+POP = torch.tensor([0., 1.])
+
+VEC1 = torch.tensor([1., 1., 0.])
+VEC2 = torch.tensor([0., 1., 1.])
+
+
+class TestStackSessionPool(unittest.TestCase):
+
+    def test_admit_evict(self):
+        pool = StackSessionPool(Stack(3), 2)
+        assert pool.admit() == 0
+        assert pool.admit() == 1
+        with self.assertRaises(RuntimeError):
+            pool.admit()
+        pool.evict(0)
+        assert pool.num_active == 1
+        assert pool.admit() == 0
+
+    def test_tick_batches_sessions(self):
+        pool = StackSessionPool(Stack(3), 4)
+        slot1 = pool.admit()
+        slot2 = pool.admit()
+        future1 = pool.submit(slot1, PUSH, VEC1)
+        future2 = pool.submit(slot2, PUSH, VEC2)
+        assert pool.tick() == 2
+        assert future1.result().tolist() == [[1., 1., 0.]]
+        assert future2.result().tolist() == [[0., 1., 1.]]
+        assert pool.stack.tapes.size(0) == 4
+
+    def test_idle_slot_is_unchanged(self):
+        pool = StackSessionPool(Stack(3), 2)
+        slot1 = pool.admit()
+        slot2 = pool.admit()
+        pool.submit(slot1, PUSH, VEC1)
+        pool.submit(slot2, PUSH, VEC2)
+        pool.tick()
+        future = pool.submit(slot1, POP, VEC1)
+        assert pool.tick() == 1
+        assert future.result().tolist() == [[0., 0., 0.], [0., 0., 0.]]
+        assert pool.stack.tapes[slot2].tolist() == [[0., 1., 1.], [0., 0., 0.]]
+
+    def test_requests_are_queued_per_slot(self):
+        pool = StackSessionPool(Stack(3), 1)
+        slot = pool.admit()
+        pool.submit(slot, PUSH, VEC1)
+        future = pool.submit(slot, PUSH, VEC2)
+        assert pool.tick() == 1
+        assert not future.done()
+        assert pool.tick() == 1
+        assert future.result().tolist() == [[0., 1., 1.], [1., 1., 0.]]
+        assert pool.tick() == 0
+
+    def test_evict_clears_slot(self):
+        pool = StackSessionPool(Stack(3), 1)
+        slot = pool.admit()
+        pool.submit(slot, PUSH, VEC1)
+        pool.tick()
+        pending = pool.submit(slot, PUSH, VEC1)
+        pool.evict(slot)
+        assert pending.cancelled()
+        assert pool.stack.tapes.tolist() == [[[0., 0., 0.]]]
+        with self.assertRaises(KeyError):
+            pool.submit(slot, PUSH, VEC1)
+
+    def test_asubmit(self):
+        pool = StackSessionPool(Stack(3), 2)
+        slots = [pool.admit(), pool.admit()]
+
+        async def run():
+            return await asyncio.gather(pool.asubmit(slots[0], PUSH, VEC1),
+                                        pool.asubmit(slots[1], PUSH, VEC2))
+
+        pool.start()
+        try:
+            tapes1, tapes2 = asyncio.run(run())
+        finally:
+            pool.stop()
+        assert tapes1.tolist() == [[1., 1., 0.]]
+        assert tapes2.tolist() == [[0., 1., 1.]]
+
+
+if __name__ == "__main__":
+    unittest.main()
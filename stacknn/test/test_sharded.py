@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import torch
+
+from stacknn.benchmarks.sharding import default_shard_counts, run_scaling
+from stacknn.structs import Queue, ShardedStruct, Stack
+
+
+class TestShardedStruct(unittest.TestCase):
+
+    def test_matches_unsharded(self):
+        for struct_type in [Stack, Queue]:
+            struct = struct_type(7, 3)
+            sharded = ShardedStruct(struct_type, 7, 3, num_shards=3)
+            self.assertEqual(sharded.shard_sizes, [3, 2, 2])
+            for _ in range(5):
+                values = torch.randn(7, 3)
+                pop_strengths, push_strengths = torch.rand(7, 1), torch.rand(7, 1)
+                torch.testing.assert_close(sharded(values, pop_strengths, push_strengths),
+                                           struct(values, pop_strengths, push_strengths))
+            torch.testing.assert_close(sharded.read(torch.full((7, 1), .5)), struct.read(torch.full((7, 1), .5)))
+            strengths = torch.rand(7, 2)
+            torch.testing.assert_close(sharded.read_heads(strengths), struct.read_heads(strengths))
+            sharded.close()
+
+    def test_shared_executor(self):
+        with ThreadPoolExecutor(2) as executor:
+            sharded = ShardedStruct(Stack, 2, 3, num_shards=4, executor=executor)
+            self.assertEqual(sharded.num_shards, 2)
+            sharded.push(torch.randn(2, 3), torch.ones(2, 1))
+            sharded.pop(torch.full((2, 1), .5))
+            self.assertEqual(sharded.read(torch.ones(2, 1)).shape, (2, 3))
+            sharded.close()
+            self.assertEqual(executor.submit(len, []).result(), 0)
+
+    def test_backward(self):
+        sharded = ShardedStruct(Stack, 4, 3, num_shards=2)
+        values = torch.randn(4, 3, requires_grad=True)
+        sharded(values, torch.zeros(4), torch.ones(4)).sum().backward()
+        torch.testing.assert_close(values.grad, torch.ones(4, 3))
+        sharded.close()
+
+    def test_no_grad(self):
+        sharded = ShardedStruct(Stack, 4, 3, num_shards=2)
+        strengths = torch.full((4, 1), .5, requires_grad=True)
+        with torch.no_grad():
+            for _ in range(2):
+                read = sharded(torch.randn(4, 3), strengths, strengths)
+        self.assertFalse(read.requires_grad)
+        for shard in sharded.shards:
+            self.assertFalse(any(strength.requires_grad for strength in shard._strengths[:-1]))
+        with torch.inference_mode():
+            read = sharded(torch.randn(4, 3), torch.zeros(4, 1), torch.ones(4, 1))
+        self.assertTrue(read.is_inference())
+        sharded.close()
+
+    def test_state(self):
+        sharded = ShardedStruct(Stack, 4, 3, num_shards=2)
+        sharded.push(torch.randn(4, 3), torch.ones(4, 1))
+        sharded.shards[1].push(torch.randn(2, 3), torch.ones(2, 1))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.pt")
+            sharded.save_state(path)
+            restored = ShardedStruct(Stack, 4, 3, num_shards=2)
+            restored.load_state(path, mmap=False)
+        torch.testing.assert_close(restored.read(torch.ones(4, 1)), sharded.read(torch.ones(4, 1)))
+        sharded.close()
+        restored.close()
+
+    def test_scaling(self):
+        self.assertEqual(default_shard_counts(6), [1, 2, 4, 6])
+        results = run_scaling("Stack", [1, 2], batch_size=4, length=2, repeats=1)
+        self.assertEqual([result["num_shards"] for result in results], [1, 2])
+        self.assertEqual(results[0]["speedup"], 1.)
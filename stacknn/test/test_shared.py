@@ -0,0 +1,112 @@
+import unittest
+import torch
+import torch.multiprocessing as mp
+
+from numpy.testing import assert_approx_equal
+
+from stacknn.structs import Stack as WeightedStack, SharedStructState
+from stacknn.superpos import Stack, SharedTapes
+
+
+PUSH = torch.tensor([[1., 0.]])
+POP = torch.tensor([[0., 1.]])
+
+
+def _push_worker(shared, slot):
+    stack = Stack(3, max_depth=4)
+    vec = torch.full([1, 3], float(slot + 1))
+    shared.update(stack, slice(slot, slot + 1), PUSH, vec)
+
+
+class TestSharedTapes(unittest.TestCase):
+
+    def test_update_slice(self):
+        shared = SharedTapes(4, 3, max_depth=4)
+        stack = Stack(3, max_depth=4)
+        tapes = shared.update(stack, slice(1, 3), PUSH.repeat(2, 1), torch.ones(2, 3))
+        assert tapes.tolist() == [[[1., 1., 1.]], [[1., 1., 1.]]]
+        assert shared.depths.tolist() == [0, 1, 1, 0]
+        assert shared.tapes[0].abs().sum().item() == 0.
+
+    def test_view_is_shared(self):
+        shared = SharedTapes(2, 3, max_depth=4)
+        stack = Stack(3, max_depth=4)
+        shared.update(stack, slice(0, 2), PUSH.repeat(2, 1), torch.ones(2, 3))
+        view = shared.view(slice(0, 1))
+        assert view.data_ptr() == shared.tapes.data_ptr()
+
+    def test_max_depth_required(self):
+        shared = SharedTapes(2, 3, max_depth=4)
+        with self.assertRaises(ValueError):
+            shared.attach(Stack(3), slice(0, 1))
+
+    def test_move(self):
+        shared = SharedTapes(2, 3, max_depth=4)
+        stack = Stack(3, max_depth=4)
+        shared.update(stack, slice(0, 1), PUSH, torch.ones(1, 3))
+        shared.move(0, 1)
+        assert shared.depths.tolist() == [0, 1]
+        assert shared.view(slice(1, 2)).tolist() == [[[1., 1., 1.]]]
+
+    def test_multiprocess(self):
+        shared = SharedTapes(2, 3, max_depth=4)
+        ctx = mp.get_context("spawn")
+        workers = [ctx.Process(target=_push_worker, args=(shared, slot)) for slot in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert shared.view(slice(0, 2)).tolist() == [[[1., 1., 1.]], [[2., 2., 2.]]]
+
+
+class TestSharedStructState(unittest.TestCase):
+
+    def test_matches_unshared(self):
+        shared = SharedStructState(1, 1, capacity=4)
+        reference = WeightedStack(1, 1)
+        inputs = [([[1.]], [[0.]], [[.8]]), ([[2.]], [[.1]], [[.5]]), ([[3.]], [[.9]], [[.9]])]
+        for args in inputs:
+            args = [torch.tensor(arg) for arg in args]
+            # Each step uses a fresh struct, as if served by a different worker.
+            out = shared.forward(WeightedStack(1, 1), slice(0, 1), *args)
+            assert_approx_equal(out.item(), reference(*args).item())
+
+    def test_padding(self):
+        shared = SharedStructState(2, 1, capacity=4)
+        stack = WeightedStack(1, 1)
+        shared.forward(stack, slice(0, 1), torch.ones(1, 1), torch.zeros(1, 1), torch.ones(1, 1))
+        stack = WeightedStack(2, 1)
+        shared.attach(stack, slice(0, 2))
+        assert len(stack) == 1
+        out = stack.read(torch.ones(2, 1))
+        assert out.tolist() == [[1.], [0.]]
+
+    def test_slot_lengths(self):
+        shared = SharedStructState(2, 1, capacity=4)
+        shared.forward(WeightedStack(1, 1), slice(0, 1), torch.ones(1, 1), torch.zeros(1, 1),
+                       torch.ones(1, 1))
+        for step in range(3):
+            stack = WeightedStack(2, 1)
+            shared.attach(stack, slice(0, 2))
+            if step == 0:
+                stack.push(torch.full((2, 1), 2.), torch.ones(2, 1))
+            shared.commit(stack, slice(0, 2))
+            # The padding of the shorter slot is not stored as its own items.
+            assert shared.lengths.tolist() == [2, 1]
+        assert shared.values[1, :, 0].tolist() == [2., 0., 0., 0.]
+        stack = WeightedStack(2, 1)
+        shared.attach(stack, slice(0, 2))
+        assert stack.read(torch.full((2, 1), 2.)).tolist() == [[3.], [2.]]
+
+    def test_capacity(self):
+        shared = SharedStructState(1, 1, capacity=1)
+        stack = WeightedStack(1, 1)
+        shared.attach(stack, slice(0, 1))
+        stack.push(torch.ones(1, 1), torch.ones(1, 1))
+        stack.push(torch.ones(1, 1), torch.ones(1, 1))
+        with self.assertRaises(ValueError):
+            shared.commit(stack, slice(0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
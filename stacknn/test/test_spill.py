@@ -0,0 +1,64 @@
+import gc
+import os
+import unittest
+import torch
+
+from stacknn.structs import SpillingStack, Stack
+
+
+class TestSpillingStack(unittest.TestCase):
+
+    def test_matches_stack(self):
+        torch.manual_seed(0)
+        stack = Stack(3, 4)
+        spilling = SpillingStack(3, 4, hot_depth=3, spill_capacity=32)
+        max_depth = 0
+        with torch.no_grad():
+            for step in range(24):
+                # Push strongly at first to build a deep stack, then pop it back down.
+                pop_scale = .3 if step < 12 else 2.
+                args = torch.randn(3, 4), pop_scale * torch.rand(3, 1), torch.rand(3, 1)
+                torch.testing.assert_close(spilling(*args), stack(*args))
+                assert len(spilling) <= 3
+                max_depth = max(max_depth, spilling.depth)
+        assert max_depth > 3 and spilling.depth < max_depth
+        spilling.close()
+
+    def test_pages_in_on_read(self):
+        spilling = SpillingStack(1, 1, hot_depth=2, spill_capacity=8)
+        for value in [1., 2., 3., 4.]:
+            spilling.push(torch.tensor([[value]]), torch.ones(1, 1))
+        assert len(spilling) == 2 and spilling.depth == 4
+        read = spilling.read(torch.tensor([[3.5]]))
+        assert read.item() == 4. + 3. + 2. + .5 * 1.
+        assert spilling.depth == 4
+        # Reading pages items back in, but the memory bound still holds afterwards.
+        assert len(spilling) == 2
+        assert spilling.read_heads(torch.tensor([[1., 4.]])).shape == (1, 2, 1)
+        assert len(spilling) == 2
+        spilling.close()
+
+    def test_removes_temporary_file(self):
+        with SpillingStack(1, 1, hot_depth=1, spill_capacity=4) as spilling:
+            for value in [1., 2.]:
+                spilling.push(torch.tensor([[value]]), torch.ones(1, 1))
+            path = spilling._cold.path
+            assert os.path.exists(path)
+        assert not os.path.exists(path)
+
+        spilling = SpillingStack(1, 1, hot_depth=1, spill_capacity=4)
+        for value in [1., 2.]:
+            spilling.push(torch.tensor([[value]]), torch.ones(1, 1))
+        path = spilling._cold.path
+        del spilling
+        gc.collect()
+        assert not os.path.exists(path)
+
+    def test_inference_only(self):
+        spilling = SpillingStack(1, 2, hot_depth=2, spill_capacity=8)
+        with self.assertRaises(RuntimeError):
+            spilling.push(torch.ones(1, 2, requires_grad=True), torch.ones(1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+import torch
+
+from stacknn.structs import Queue, Stack as WeightedStack, VectorizedStack
+from stacknn.superpos import Deque, Stack
+
+
+class TestState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.pt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_superpos(self):
+        for stack_type in [Stack, Deque]:
+            stack = stack_type.empty(2, 3)
+            num_actions = stack.get_num_actions()
+            for _ in range(3):
+                stack.update(torch.softmax(torch.randn(2, num_actions), -1), torch.randn(2, 3))
+            stack.save_state(self.path)
+
+            restored = stack_type.empty(2, 3)
+            restored.load_state(self.path)
+            torch.testing.assert_close(restored.tapes, stack.tapes)
+            policies, new_vecs = torch.softmax(torch.randn(2, num_actions), -1), torch.randn(2, 3)
+            torch.testing.assert_close(restored.update(policies, new_vecs),
+                                       stack.update(policies, new_vecs))
+
+    def test_weighted(self):
+        for struct_type in [WeightedStack, Queue, VectorizedStack]:
+            struct = struct_type(2, 3)
+            for _ in range(3):
+                struct(torch.randn(2, 3), torch.rand(2, 1), torch.rand(2, 1))
+            struct.save_state(self.path)
+
+            restored = struct_type(2, 3)
+            restored.load_state(self.path, mmap=False)
+            args = torch.randn(2, 3), torch.rand(2, 1), torch.rand(2, 1)
+            torch.testing.assert_close(restored(*args), struct(*args))
+
+    def test_empty(self):
+        WeightedStack(2, 3).save_state(self.path)
+        restored = WeightedStack(2, 3)
+        restored.load_state(self.path)
+        assert len(restored) == 0
+
+    def test_mismatch(self):
+        Stack.empty(2, 3).save_state(self.path)
+        with self.assertRaises(ValueError):
+            Stack.empty(2, 4).load_state(self.path)
+        with self.assertRaises(ValueError):
+            Deque.empty(2, 3).load_state(self.path)
+
+    def test_weighted_mismatch(self):
+        VectorizedStack(2, 3, num_heads=2).save_state(self.path)
+        with self.assertRaises(ValueError):
+            VectorizedStack(2, 3).load_state(self.path)
+        WeightedStack(2, 3, capacity=4).save_state(self.path)
+        with self.assertRaises(ValueError):
+            WeightedStack(2, 3).load_state(self.path)
+        with self.assertRaises(ValueError):
+            Queue(2, 3, capacity=4).load_state(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import torch
+
+from numpy.testing import assert_approx_equal
+
+from stacknn.structs import Stack as WeightedStack
+from stacknn.superpos import Stack
+from stacknn.utils.streaming import stream
+
+
+PUSH = torch.tensor([[1., 0.]])
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_superpos_stream(self):
+        stack = Stack.empty(1, 3)
+        vec = torch.ones(1, 3, requires_grad=True)
+        inputs = ((PUSH, vec) for _ in range(5))
+        with self.assertWarns(RuntimeWarning):
+            outputs = list(stream(stack, inputs, detach_every=2))
+        assert len(outputs) == 5
+        assert outputs[-1].size() == (1, 5, 3)
+        assert stack.tapes.requires_grad
+
+        # The history before the last detach is cut.
+        outputs[-1].sum().backward()
+        assert vec.grad.tolist() == [[1., 1., 1.]]
+
+    def test_bounded_depth(self):
+        stack = Stack.empty(1, 3, max_depth=4)
+        policies = torch.tensor([[.9, .1]])
+        inputs = ((policies, torch.randn(1, 3)) for _ in range(1000))
+        depths = {tapes.size(-2) for tapes in stream(stack, inputs, detach_every=10)}
+        assert max(depths) == 4
+
+    def test_weighted_stream(self):
+        stack = WeightedStack(1, 1)
+        inputs = [
+            (torch.tensor([[1.]]), torch.tensor([[0.]]), torch.tensor([[.8]])),
+            (torch.tensor([[2.]]), torch.tensor([[.1]]), torch.tensor([[.5]])),
+            (torch.tensor([[3.]]), torch.tensor([[.9]]), torch.tensor([[.9]])),
+        ]
+        reads = [read.item() for read in stream(stack, iter(inputs), detach_every=1)]
+        assert_approx_equal(reads[0], .8)
+        assert_approx_equal(reads[1], 1.5)
+        assert_approx_equal(reads[2], 2.8)
+
+    def test_detach_drops_dead_items(self):
+        stack = WeightedStack(2, 1, remove_zeros=False)
+        value = torch.ones(2, 1, requires_grad=True)
+        stack.push(value, torch.ones(2, 1))
+        stack.push(value, torch.tensor([[1.], [0.]]))
+        stack.pop(torch.ones(2, 1))
+        assert len(stack) == 2
+        stack.detach()
+        assert len(stack) == 1
+        assert not stack._values[0].requires_grad
+
+    def test_invalid_detach_every(self):
+        with self.assertRaises(ValueError):
+            next(stream(Stack.empty(1, 3), [], detach_every=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -97,6 +97,51 @@ class TestStructs(unittest.TestCase):
 
         assert(len(stack) == 1)
 
+    def test_stack_capacity(self):
+        stack = Stack(1, 1, capacity=2)
+        for value in [1., 2., 3.]:
+            stack.push(torch.FloatTensor([[value]]), torch.FloatTensor([[1.]]))
+        assert len(stack) == 2
+        assert_approx_equal(stack.read(torch.FloatTensor([[2.]])).item(), 5.)
+
+    def test_queue_capacity(self):
+        queue = Queue(1, 1, capacity=2)
+        for value, strength in [(1., 1.), (2., .5), (3., .25)]:
+            queue.push(torch.FloatTensor([[value]]), torch.FloatTensor([[strength]]))
+        assert len(queue) == 2
+        # The oldest item is evicted, so the queue still returns the recent inputs.
+        assert_approx_equal(queue._strengths[0].item(), .5)
+        assert_approx_equal(queue.read(torch.FloatTensor([[1.5]])).item(), 1.75)
+        queue.pop(torch.FloatTensor([[.5]]))
+        queue.push(torch.FloatTensor([[4.]]), torch.FloatTensor([[1.]]))
+        assert_approx_equal(queue.read(torch.FloatTensor([[1.]])).item(), 3.75)
+
+    def test_stack_capacity_merge(self):
+        stack = Stack(1, 1, capacity=2, merge_evicted=True)
+        stack.push(torch.FloatTensor([[1.]]), torch.FloatTensor([[1.]]))
+        stack.push(torch.FloatTensor([[4.]]), torch.FloatTensor([[.5]]))
+        stack.push(torch.FloatTensor([[3.]]), torch.FloatTensor([[1.]]))
+        assert len(stack) == 2
+        # The bottom slot holds the weighted average (1 * 1 + .5 * 4) / 1.5 with strength 1.5.
+        assert_approx_equal(stack._values[0].item(), 2.)
+        assert_approx_equal(stack._strengths[0].item(), 1.5)
+        assert_approx_equal(stack.read(torch.FloatTensor([[2.5]])).item(), 6.)
+
+    def test_fused_forward(self):
+        """The fused forward matches a separate pop, push and read."""
+        torch.manual_seed(0)
+        for struct_type in [Stack, Queue]:
+            fused = struct_type(4, 3)
+            separate = struct_type(4, 3)
+            for _ in range(12):
+                # Round the strengths so that items are popped exactly and removed.
+                args = (torch.randn(4, 3), torch.rand(4, 1).round(decimals=1),
+                        torch.rand(4, 1).round(decimals=1), 2 * torch.rand(4, 1))
+                separate.pop(args[1])
+                separate.push(args[0], args[2])
+                torch.testing.assert_close(fused(*args), separate.read(args[3]))
+                assert len(fused) == len(separate)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import torch
+from torch.func import vmap
+
+from numpy.testing import assert_approx_equal
+
+from stacknn.structs import Stack, Queue
+import stacknn.structs.functional as F
+
+
+class TestStructsFunctional(unittest.TestCase):
+
+    def test_stack_step(self):
+        """Stack example from Grefenstette paper."""
+        state = F.empty_state(1, 1)
+        state, out = F.stack_step(state, torch.tensor([[1.]]), torch.tensor([0.]), torch.tensor([.8]))
+        assert_approx_equal(out.item(), .8)
+        state, out = F.stack_step(state, torch.tensor([[2.]]), torch.tensor([.1]), torch.tensor([.5]))
+        assert_approx_equal(out.item(), 1.5)
+        state, out = F.stack_step(state, torch.tensor([[3.]]), torch.tensor([.9]), torch.tensor([.9]))
+        assert_approx_equal(out.item(), 2.8)
+        values, strengths = state
+        assert values.size() == (1, 3, 1)
+        assert strengths.size() == (1, 3)
+
+    def test_matches_modules(self):
+        torch.manual_seed(0)
+        for struct_type, step in [(Stack, F.stack_step), (Queue, F.queue_step)]:
+            struct = struct_type(4, 3)
+            state = F.empty_state(4, 3)
+            for _ in range(8):
+                args = torch.randn(4, 3), torch.rand(4, 1), torch.rand(4, 1), 2 * torch.rand(4, 1)
+                state, out = step(state, *args)
+                torch.testing.assert_close(out, struct(*args))
+
+    def test_vmap_ensemble(self):
+        torch.manual_seed(0)
+        num_members = 3
+        state = F.empty_state(2, 4)
+        states = tuple(tensor.expand(num_members, *tensor.size()) for tensor in state)
+        for _ in range(5):
+            args = torch.randn(num_members, 2, 4), torch.rand(num_members, 2), torch.rand(num_members, 2)
+            new_states, outs = vmap(F.stack_step)(states, *args)
+            for member in range(num_members):
+                member_state = tuple(tensor[member] for tensor in states)
+                _, out = F.stack_step(member_state, *(arg[member] for arg in args))
+                torch.testing.assert_close(outs[member], out)
+            states = new_states
+
+    def test_script(self):
+        scripted = torch.jit.script(F.stack_step)
+        state = F.empty_state(2, 3)
+        args = torch.randn(2, 3), torch.rand(2), torch.rand(2)
+        _, expected = F.stack_step(state, *args)
+        _, out = scripted(state, *args)
+        torch.testing.assert_close(out, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
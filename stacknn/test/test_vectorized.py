@@ -0,0 +1,71 @@
+import unittest
+import torch
+
+from numpy.testing import assert_approx_equal
+
+from stacknn.structs import Stack, Queue, VectorizedStack, VectorizedQueue
+
+
+class TestVectorized(unittest.TestCase):
+
+    def test_stack(self):
+        """Stack example from Grefenstette paper."""
+        stack = VectorizedStack(1, 1)
+        out = stack(torch.FloatTensor([[1]]), torch.FloatTensor([[0]]), torch.FloatTensor([[.8]]))
+        assert_approx_equal(out.item(), .8)
+        out = stack(torch.FloatTensor([[2]]), torch.FloatTensor([[.1]]), torch.FloatTensor([[.5]]))
+        assert_approx_equal(out.item(), 1.5)
+        out = stack(torch.FloatTensor([[3]]), torch.FloatTensor([[.9]]), torch.FloatTensor([[.9]]))
+        assert_approx_equal(out.item(), 2.8)
+
+    def test_queue(self):
+        queue = VectorizedQueue(1, 1)
+        out = queue(torch.FloatTensor([[1]]), torch.FloatTensor([[0]]), torch.FloatTensor([[.8]]))
+        assert_approx_equal(out.item(), .8)
+        out = queue(torch.FloatTensor([[2]]), torch.FloatTensor([[.1]]), torch.FloatTensor([[.5]]))
+        assert_approx_equal(out.item(), 1.3)
+        out = queue(torch.FloatTensor([[3]]), torch.FloatTensor([[.9]]), torch.FloatTensor([[.9]]))
+        assert_approx_equal(out.item(), 2.7)
+
+    def test_matches_simple(self):
+        torch.manual_seed(0)
+        for simple_type, vectorized_type in [(Stack, VectorizedStack), (Queue, VectorizedQueue)]:
+            simple = simple_type(4, 3)
+            vectorized = vectorized_type(4, 3)
+            for _ in range(10):
+                args = torch.randn(4, 3), torch.rand(4, 1), torch.rand(4, 1), 2 * torch.rand(4, 1)
+                torch.testing.assert_close(vectorized(*args), simple(*args))
+
+    def test_detach(self):
+        stack = VectorizedStack(2, 1)
+        value = torch.ones(2, 1, requires_grad=True)
+        stack.push(value, torch.ones(2))
+        stack.push(value, torch.tensor([1., 0.]))
+        stack.pop(torch.ones(2))
+        assert len(stack) == 2
+        stack.detach()
+        assert len(stack) == 1
+        assert not stack.values.requires_grad
+
+    def test_read_heads(self):
+        torch.manual_seed(0)
+        for simple_type, vectorized_type in [(Stack, VectorizedStack), (Queue, VectorizedQueue)]:
+            simple = simple_type(4, 3)
+            vectorized = vectorized_type(4, 3)
+            assert simple.read_heads(torch.ones(4, 2)).shape == (4, 2, 3)
+            assert simple.read(1.).tolist() == [[0.] * 3] * 4
+            for _ in range(5):
+                args = torch.randn(4, 3), torch.rand(4, 1), torch.rand(4, 1)
+                simple(*args)
+                vectorized(*args)
+
+            strengths = 3 * torch.rand(4, 5)
+            expected = torch.stack([vectorized.read(strengths[:, k:k + 1]) for k in range(5)], 1)
+            torch.testing.assert_close(simple.read_heads(strengths), expected)
+            torch.testing.assert_close(vectorized.read_heads(strengths), expected)
+            torch.testing.assert_close(simple.read(strengths[:, 0]), expected[:, 0])
+            torch.testing.assert_close(simple.read(1.5), vectorized.read(1.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
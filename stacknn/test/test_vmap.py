@@ -0,0 +1,64 @@
+import unittest
+import torch
+from torch.func import grad, vmap
+
+import stacknn.superpos.functional as F
+
+
+# Each update function with the number of actions it takes and any extra positional arguments.
+UPDATES = [
+    (F.update_stack, 2, ()),
+    (F.update_noop_stack, 3, ()),
+    (F.update_rewrite_stack, 3, ()),
+    (F.update_minimalist_stack, 2, ()),
+    (F.update_transition_parser_stack, 3, ()),
+    (F.update_kpop_stack, 4, (4,)),
+    (F.update_kpush_stack, 4, (4,)),
+]
+
+
+class TestVmap(unittest.TestCase):
+
+    def test_vmap_ensemble(self):
+        """Map over an ensemble dimension in front of the batch dimension."""
+        torch.manual_seed(0)
+        for update, num_actions, extra in UPDATES:
+            tapes = torch.randn(3, 2, 4, 5)
+            policies = torch.softmax(torch.randn(3, 2, num_actions), dim=-1)
+            new_vecs = torch.randn(3, 2, 5)
+
+            def update_member(tapes, policies, new_vecs):
+                return update(tapes, policies, new_vecs, *extra, 4, .5)
+
+            outputs = vmap(update_member)(tapes, policies, new_vecs)
+            for member in range(3):
+                expected = update_member(tapes[member], policies[member], new_vecs[member])
+                torch.testing.assert_close(outputs[member], expected, msg=update.__name__)
+
+    def test_per_sample_grad(self):
+        """Compute gradients with respect to each example's policies in one call."""
+        torch.manual_seed(0)
+        for update, num_actions, extra in UPDATES:
+            tapes = torch.randn(6, 3, 5)
+            policies = torch.softmax(torch.randn(6, num_actions), dim=-1)
+            new_vecs = torch.randn(6, 5)
+
+            def loss(policies, tapes, new_vecs):
+                # Unbatched inputs: tapes [depth, stack_dim], policies [num_actions].
+                new_tapes = update(tapes, policies, new_vecs, *extra)
+                return new_tapes.pow(2).sum()
+
+            grads = vmap(grad(loss))(policies, tapes, new_vecs)
+            for example in range(6):
+                example_policies = policies[example].clone().requires_grad_()
+                loss(example_policies, tapes[example], new_vecs[example]).backward()
+                torch.testing.assert_close(grads[example], example_policies.grad, msg=update.__name__)
+
+    def test_unbatched(self):
+        tapes = torch.randn(3, 5)
+        new_tapes = F.update_stack(tapes, torch.tensor([0., 1.]), torch.randn(5))
+        torch.testing.assert_close(new_tapes, torch.cat([tapes[1:], torch.zeros(2, 5)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,5 @@
 from __future__ import print_function
 
-from numpy.testing import assert_approx_equal
-
 import torch
 
 
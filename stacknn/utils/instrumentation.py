@@ -0,0 +1,199 @@
+"""Opt-in instrumentation of the stack updates and the struct operations.
+
+Methods decorated with instrumented report an Event to every registered hook, either global ones
+or ones registered on the particular stack or struct. While no hook is registered and the torch
+profiler is off, a decorated method only costs a few attribute lookups. While the torch profiler
+is on, each call is also wrapped in a torch.profiler.record_function range.
+
+The functional updates in stacknn.superpos.functional are left without ranges of their own: a
+record_function range costs several microseconds even while the profiler is off, about as much
+as a whole update of a small batch. Their calls are covered by the update methods of the stack
+classes.
+"""
+
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import torch
+from torch.utils._python_dispatch import TorchDispatchMode
+from torch.utils._pytree import tree_leaves
+from torch.utils.hooks import RemovableHandle
+
+
+class Event(NamedTuple):
+    name: str  # Qualified name of the method, e.g. Stack.update.
+    start: float  # time.perf_counter() at the start of the call, in seconds.
+    duration: float  # Wall time of the call, in seconds.
+    depth: int  # Depth of the tapes, or number of items in a struct, after the call.
+    bytes_allocated: Optional[int]  # Bytes of the new tensor storages, on any device.
+    cascade_iterations: Optional[int]  # Items visited by a SimpleStruct cascade.
+    early_exit: Optional[bool]  # Whether the cascade stopped before the last item.
+    thread: int
+
+
+Hook = Callable[[Event], None]
+
+_global_hooks: Dict[int, Hook] = OrderedDict()
+
+
+def add_hook(hook: Hook, target=None) -> RemovableHandle:
+    """Register a hook that is called with an Event after every instrumented call on target, or on
+    any stack or struct if target is None. Returns a handle whose remove() unregisters the hook."""
+    if target is None:
+        hooks = _global_hooks
+    else:
+        hooks = target.__dict__.setdefault("_instrumentation_hooks", OrderedDict())
+    handle = RemovableHandle(hooks)
+    hooks[handle.id] = hook
+    return handle
+
+
+def is_instrumented(obj) -> bool:
+    """Whether any hook receives the events of obj. Bookkeeping that only feeds the events, like
+    the cascade statistics of SimpleStruct, should be skipped otherwise."""
+    return bool(_global_hooks or obj.__dict__.get("_instrumentation_hooks"))
+
+
+def _get_depth(obj) -> int:
+    tapes = getattr(obj, "tapes", None)
+    if tapes is not None:
+        return tapes.size(-2)
+    return len(obj)
+
+
+class _AllocationCounter(TorchDispatchMode):
+
+    """Sums the sizes of the storages created by the operators run under it. Outputs that share
+    a storage with an input, like views and in-place results, allocate nothing. Unlike
+    torch.cuda.memory_allocated, this works on the CPU, and is not offset by tensors freed
+    during the call."""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes = 0
+
+    def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        result = func(*args, **kwargs)
+        inputs = _storages((args, kwargs))
+        self.bytes += sum(nbytes for ptr, nbytes in _storages(result).items() if ptr not in inputs)
+        return result
+
+
+def _storages(tree) -> Dict[int, int]:
+    """Map the data pointers of the storages of the dense tensors in tree to their sizes."""
+    return {leaf.untyped_storage().data_ptr(): leaf.untyped_storage().nbytes()
+            for leaf in tree_leaves(tree) if torch.is_tensor(leaf) and leaf.layout == torch.strided}
+
+
+def instrumented(method):
+    """Decorate a method of a stack or struct so that its calls are reported to the hooks."""
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        instance_hooks = self.__dict__.get("_instrumentation_hooks")
+        profiling = torch.autograd._profiler_enabled()
+        if not (_global_hooks or instance_hooks or profiling):
+            return method(self, *args, **kwargs)
+
+        with torch.profiler.record_function(name):
+            if not (_global_hooks or instance_hooks):
+                return method(self, *args, **kwargs)
+
+            self._cascade = None
+            start = time.perf_counter()
+            with _AllocationCounter() as allocations:
+                result = method(self, *args, **kwargs)
+            duration = time.perf_counter() - start
+
+        cascade = self.__dict__.pop("_cascade", None) or (None, None)
+        event = Event(name, start, duration, _get_depth(self),
+                      allocations.bytes,
+                      cascade[0], cascade[1], threading.get_ident())
+        for hook in list(_global_hooks.values()):
+            hook(event)
+        for hook in list((instance_hooks or {}).values()):
+            hook(event)
+        return result
+
+    return wrapper
+
+
+class Collector:
+
+    """A hook that keeps every Event it receives, for a summary or a Chrome trace."""
+
+    def __init__(self):
+        self.events: List[Event] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Aggregate the events by method name."""
+        groups = defaultdict(list)
+        for event in self.events:
+            groups[event.name].append(event)
+
+        summary = {}
+        for name, events in groups.items():
+            total = sum(event.duration for event in events)
+            stats = {
+                "calls": len(events),
+                "total_time": total,
+                "mean_time": total / len(events),
+                "mean_depth": sum(event.depth for event in events) / len(events),
+                "max_depth": max(event.depth for event in events),
+            }
+            allocated = [event.bytes_allocated for event in events if event.bytes_allocated is not None]
+            if allocated:
+                stats["bytes_allocated"] = sum(allocated)
+            cascades = [event for event in events if event.cascade_iterations is not None]
+            if cascades:
+                stats["mean_cascade_iterations"] = \
+                    sum(event.cascade_iterations for event in cascades) / len(cascades)
+                stats["early_exit_rate"] = sum(event.early_exit for event in cascades) / len(cascades)
+            summary[name] = stats
+        return summary
+
+    def chrome_trace(self) -> Dict:
+        """Return the events in the Chrome trace format, viewable in chrome://tracing or Perfetto."""
+        trace_events = []
+        for event in self.events:
+            args = {"depth": event.depth}
+            for key in ["bytes_allocated", "cascade_iterations", "early_exit"]:
+                if getattr(event, key) is not None:
+                    args[key] = getattr(event, key)
+            trace_events.append({
+                "name": event.name,
+                "ph": "X",
+                "ts": event.start * 1e6,
+                "dur": event.duration * 1e6,
+                "pid": 0,
+                "tid": event.thread,
+                "args": args,
+            })
+        return {"traceEvents": trace_events}
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as fh:
+            json.dump(self.chrome_trace(), fh)
+
+
+@contextmanager
+def collect(target=None) -> Iterator[Collector]:
+    """Collect the events of target, or of every stack and struct, within a with block."""
+    collector = Collector()
+    handle = add_hook(collector, target)
+    try:
+        yield collector
+    finally:
+        handle.remove()
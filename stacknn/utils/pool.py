@@ -0,0 +1,69 @@
+"""A pool of preallocated tensors, to avoid allocator churn when tensors of the same few shapes
+are allocated and freed over and over.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+
+class TensorPool:
+
+    """Recycles released tensors for later acquisitions of the same size class.
+
+    A size class is a (shape, dtype, device) triple, e.g. (batch_size, depth, stack_dim) for the
+    tapes of a superposition stack. A tensor must not be used after it has been released, since it
+    may be handed out again by the next acquisition of its size class.
+    """
+
+    def __init__(self, max_per_class: int = 4):
+        self.max_per_class = max_per_class
+        self.hits = 0
+        self.misses = 0
+        self._free: Dict[Tuple, List[torch.Tensor]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size_class(shape: Sequence[int], dtype: torch.dtype, device: torch.device) -> Tuple:
+        return tuple(shape), dtype, torch.device(device)
+
+    def acquire(self,
+                shape: Sequence[int],
+                dtype: Optional[torch.dtype] = None,
+                device: Optional[torch.device] = None) -> torch.Tensor:
+        """Return an uninitialized tensor, recycled from the pool if possible."""
+        dtype = dtype if dtype is not None else torch.get_default_dtype()
+        device = device if device is not None else torch.device("cpu")
+        with self._lock:
+            free = self._free.get(self._size_class(shape, dtype, device))
+            if free:
+                self.hits += 1
+                return free.pop()
+            self.misses += 1
+        return torch.empty(shape, dtype=dtype, device=device)
+
+    def release(self, tensor: torch.Tensor) -> None:
+        """Return a tensor to the pool. Views and tensors tracked by autograd are not recycled."""
+        if tensor._base is not None or tensor.requires_grad:
+            return
+        with self._lock:
+            free = self._free[self._size_class(tensor.shape, tensor.dtype, tensor.device)]
+            if len(free) < self.max_per_class:
+                free.append(tensor)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._free.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.,
+                "pooled": sum(len(free) for free in self._free.values()),
+                "pooled_bytes": sum(tensor.nbytes for free in self._free.values() for tensor in free),
+            }
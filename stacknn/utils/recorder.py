@@ -0,0 +1,147 @@
+"""Always-on recording of stack trajectories during training.
+
+Unlike SimpleStruct.log, recording never copies anything to the host: each step is written into
+preallocated ring buffers on the device of the stack, so that only the last capacity steps are
+kept. The buffers are only read when the recording is saved.
+"""
+
+import os
+from typing import Dict, Optional, Union
+
+import torch
+
+from stacknn.structs.base import Struct
+from stacknn.superpos.base import AbstractStack
+
+
+# Floating-point dtypes that numpy can represent.
+_NUMPY_FLOATS = (torch.float16, torch.float32, torch.float64)
+
+
+class TrajectoryRecorder:
+
+    """Records per-step statistics of a stack or struct into ring buffers of capacity steps.
+
+    For an AbstractStack, each step records the policies, the number of nonzero rows of the tapes,
+    and the norm of the top row. For a Struct, each step records the pop, push and read strengths,
+    the total strength in the struct, and the norm of the vector read.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.num_steps = 0
+        self.buffers: Dict[str, torch.Tensor] = {}
+        self._stack = None
+        self._method_name = None
+
+    def attach(self, stack: Union[AbstractStack, Struct]) -> "TrajectoryRecorder":
+        """Start recording every update of an AbstractStack or forward call of a Struct."""
+        if self._stack is not None:
+            raise RuntimeError("Recorder is already attached.")
+        self._method_name = "update" if isinstance(stack, AbstractStack) else "forward"
+        method = getattr(stack, self._method_name)
+
+        if isinstance(stack, AbstractStack):
+            def update(policies, new_vecs):
+                tapes = method(policies, new_vecs)
+                self._record_stack(policies, tapes)
+                return tapes
+            stack.update = update
+        else:
+            def forward(values, pop_strengths, push_strengths, read_strengths=None):
+                read_vectors = method(values, pop_strengths, push_strengths, read_strengths)
+                self._record_struct(stack, pop_strengths, push_strengths, read_strengths,
+                                    read_vectors)
+                return read_vectors
+            stack.forward = forward
+
+        self._stack = stack
+        return self
+
+    def detach(self) -> None:
+        """Stop recording. The recorded steps are kept."""
+        if self._stack is not None:
+            delattr(self._stack, self._method_name)
+            self._stack = None
+
+    def _record_stack(self, policies: torch.Tensor, tapes: torch.Tensor) -> None:
+        self._record({
+            "policies": policies,
+            "depth": (tapes != 0).any(dim=-1).sum(dim=-1),
+            "top_norm": tapes[..., 0, :].norm(dim=-1),
+        })
+
+    def _record_struct(self, struct, pop_strengths, push_strengths, read_strengths, read_vectors):
+        batch_shape = read_vectors.shape[:-1]
+        if read_strengths is None:
+            read_strengths = 1.
+        strengths = getattr(struct, "strengths", None)
+        if not torch.is_tensor(strengths):
+            # A SimpleStruct keeps one [batch_size x 1] tensor per item.
+            items = [torch.as_tensor(strength, device=read_vectors.device).reshape(-1, 1)
+                     .expand(batch_shape.numel(), 1) for strength in struct._strengths]
+            strengths = torch.cat(items, 1) if items else read_vectors.new_zeros(batch_shape + (0,))
+        self._record({
+            "pop_strengths": self._to_strengths(pop_strengths, read_vectors),
+            "push_strengths": self._to_strengths(push_strengths, read_vectors),
+            "read_strengths": self._to_strengths(read_strengths, read_vectors),
+            "depth": strengths.sum(dim=-1).reshape(batch_shape),
+            "top_norm": read_vectors.norm(dim=-1),
+        })
+
+    @staticmethod
+    def _to_strengths(strength, read_vectors: torch.Tensor) -> torch.Tensor:
+        batch_shape = read_vectors.shape[:-1]
+        if not torch.is_tensor(strength):
+            return torch.full(batch_shape, strength, device=read_vectors.device)
+        return strength.reshape(batch_shape)
+
+    def _record(self, values: Dict[str, torch.Tensor]) -> None:
+        position = self.num_steps % self.capacity
+        for name, value in values.items():
+            value = value.detach()
+            if name not in self.buffers:
+                self.buffers[name] = torch.zeros((self.capacity,) + value.shape,
+                                                 device=value.device, dtype=value.dtype)
+            buffer = self.buffers[name]
+            if buffer.shape[1:] != value.shape:
+                raise ValueError("Expected {} of shape {}, got {}.".format(
+                    name, tuple(buffer.shape[1:]), tuple(value.shape)))
+            buffer[position].copy_(value)
+        self.num_steps += 1
+
+    def records(self) -> Dict[str, torch.Tensor]:
+        """Return the recorded steps in chronological order, each of shape [num_kept, ...]."""
+        num_kept = min(self.num_steps, self.capacity)
+        start = self.num_steps - num_kept
+        order = (torch.arange(num_kept) + start) % self.capacity
+        return {name: buffer[order.to(buffer.device)] for name, buffer in self.buffers.items()}
+
+    def save(self, path: str) -> None:
+        """Save the records as a .pt file of CPU tensors, or as one .npy file per field in the
+        directory path. The .npy files can be opened lazily with numpy.load(..., mmap_mode="r").
+
+        numpy has no bfloat16 or float8 dtypes, so such fields are upcast to float32 in .npy files.
+        """
+        records = {name: value.cpu() for name, value in self.records().items()}
+        if path.endswith(".pt"):
+            torch.save(records, path)
+            return
+
+        from numpy.lib.format import open_memmap
+        os.makedirs(path, exist_ok=True)
+        for name, value in records.items():
+            if value.is_floating_point() and value.dtype not in _NUMPY_FLOATS:
+                value = value.float()
+            value = value.numpy()
+            array = open_memmap(os.path.join(path, name + ".npy"), mode="w+",
+                                dtype=value.dtype, shape=value.shape)
+            array[...] = value
+            array.flush()
+
+    def clear(self, capacity: Optional[int] = None) -> None:
+        """Forget the recorded steps, optionally changing the capacity."""
+        if capacity is not None:
+            self.capacity = capacity
+        self.num_steps = 0
+        self.buffers = {}
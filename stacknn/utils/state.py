@@ -0,0 +1,37 @@
+"""Serialization of the state of stacks and structs.
+
+A state file holds a small header describing the object it was saved from, followed by its state
+as contiguous tensors. Loading with mmap=True maps the tensors from the file instead of reading
+them, so parked sessions can be restored without touching every byte up front.
+"""
+
+from typing import Dict
+
+import torch
+
+FORMAT = "stacknn-state"
+VERSION = 1
+
+
+def save_state(path: str, header: Dict, tensors: Dict[str, torch.Tensor]) -> None:
+    """Save tensors along with a header of plain values describing their owner."""
+    header = dict(header, format=FORMAT, version=VERSION)
+    tensors = {name: tensor.detach().contiguous() for name, tensor in tensors.items()}
+    torch.save({"header": header, "tensors": tensors}, path)
+
+
+def load_state(path: str, header: Dict, mmap: bool = True) -> Dict[str, torch.Tensor]:
+    """Load the tensors saved by save_state, checking that the saved header matches header.
+
+    The tensors are loaded to the CPU. With mmap, they are backed by the file until they are
+    replaced, e.g. by the next update.
+    """
+    state = torch.load(path, mmap=mmap, map_location="cpu", weights_only=True)
+    saved_header = state["header"]
+    if saved_header.get("format") != FORMAT or saved_header.get("version") != VERSION:
+        raise ValueError("{} is not a stacknn state file of version {}.".format(path, VERSION))
+    for key, value in header.items():
+        if saved_header.get(key) != value:
+            raise ValueError("State in {} has {}={!r}, expected {!r}.".format(
+                path, key, saved_header.get(key), value))
+    return state["tensors"]
@@ -0,0 +1,37 @@
+import warnings
+from typing import Iterable, Iterator, Optional, Sequence, Union
+
+import torch
+
+from stacknn.structs.base import Struct
+from stacknn.superpos.base import AbstractStack
+
+
+def stream(stack: Union[AbstractStack, Struct],
+           inputs: Iterable[Sequence[torch.FloatTensor]],
+           detach_every: Optional[int] = None) -> Iterator[torch.FloatTensor]:
+    """Run a stack over a (possibly unbounded) iterator of per-step inputs, yielding one output per step.
+
+    For an AbstractStack, each input is a (policies, new_vecs) tuple and the output is the updated
+    tapes. For a Struct, each input is a tuple of arguments to forward and the output is the read.
+
+    If detach_every is k, the state of the stack is detached from the autograd graph after every k
+    steps, which implements truncated backpropagation through time and bounds the memory held by
+    the graph. It does not bound the state itself: the tapes of an AbstractStack gain a row on every
+    step unless it has a max_depth, and a SimpleStruct keeps its items unless it has a capacity. An
+    AbstractStack without max_depth triggers a warning.
+    """
+    if detach_every is not None and detach_every < 1:
+        raise ValueError("detach_every must be positive, got {}.".format(detach_every))
+    if isinstance(stack, AbstractStack) and stack.max_depth is None:
+        warnings.warn("Streaming into a {} without max_depth, whose tapes grow on every step.".format(
+            type(stack).__name__), RuntimeWarning, stacklevel=2)
+
+    for step, args in enumerate(inputs, 1):
+        if isinstance(stack, AbstractStack):
+            yield stack.update(*args)
+        else:
+            yield stack(*args)
+
+        if detach_every is not None and step % detach_every == 0:
+            stack.detach()